@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -84,10 +85,53 @@ WSGI_APPLICATION = 'KEP.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Base de datos; por defecto el db.sqlite3 incluido en el repositorio
+BASE_DATOS = Path(os.environ.get('KEP_DB_PATH', BASE_DIR / 'db.sqlite3'))
+
+# PRAGMAs de SQLite que se aplican a cada conexión nueva; cada uno se puede cambiar con la
+# variable de entorno SQLITE_<NOMBRE> (p. ej. SQLITE_MMAP_SIZE=0 desactiva mmap).
+# - journal_mode WAL: las lecturas no esperan a la carga de horas que está escribiendo. Cambia el
+#   archivo, así que no se aplica al db.sqlite3 del repositorio salvo con SQLITE_JOURNAL_MODE=WAL
+# - synchronous NORMAL: en WAL solo se arriesga la última transacción ante un corte de energía
+# - cache_size negativo: tamaño en KiB (64 MB)
+# auto_vacuum también reescribe el archivo: se activa una sola vez con `mantenimiento_sqlite --vacuum-completo`
+SQLITE_PRAGMAS = {
+    nombre: os.environ.get(f'SQLITE_{nombre.upper()}', valor)
+    for nombre, valor in {
+        'journal_mode': None if BASE_DATOS == BASE_DIR / 'db.sqlite3' else 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+    }.items()
+}
+SQLITE_PRAGMAS = {nombre: valor for nombre, valor in SQLITE_PRAGMAS.items() if valor is not None}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': BASE_DATOS,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {nombre} = {valor}' for nombre, valor in SQLITE_PRAGMAS.items()),
+            # Segundos que una conexión espera a que se libere el bloqueo de escritura
+            'timeout': float(os.environ.get('SQLITE_TIMEOUT', 20)),
+            # Las transacciones toman el bloqueo de escritura al iniciar, así esperan el timeout
+            # en lugar de fallar con "database is locked" al pasar de lectura a escritura
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
+    }
+}
+
+
+# Caché compartido por todos los procesos del servidor (resultados y estadísticas de KPIs).
+# El de memoria por defecto de Django sería uno distinto por proceso.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('KEP_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
@@ -154,4 +198,19 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_LIFETIME': timedelta(days=30),
     'SLIDING_TOKEN_REFRESH_LIFETIME_LATE_USER': timedelta(days=1),
     'SLIDING_TOKEN_LIFETIME_LATE_USER': timedelta(days=30),
-}
\ No newline at end of file
+}
+
+# Hilos del pool que procesa en segundo plano las cargas de registro de horas.
+# SQLite admite un solo escritor a la vez, por lo que no conviene subirlo.
+CARGA_HORAS_WORKERS = 1
+
+# Procesos usados para leer en paralelo los archivos de un ZIP (None = núcleos disponibles).
+# La escritura siempre la hace un solo hilo.
+CARGA_HORAS_PROCESOS = None
+
+# Filas escritas (creadas + actualizadas) a partir de las cuales una carga de horas ejecuta al
+# terminar el mantenimiento de SQLite (estadísticas del planificador y vacuum incremental). 0 = nunca.
+SQLITE_MANTENIMIENTO_FILAS = int(os.environ.get('SQLITE_MANTENIMIENTO_FILAS', 50000))
+
+# Páginas libres que devuelve al sistema cada vacuum incremental (0 = todas)
+SQLITE_VACUUM_PAGINAS = int(os.environ.get('SQLITE_VACUUM_PAGINAS', 0))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 10:59
+
+from datetime import date
+
+from django.db import migrations, models
+
+MESES = [
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
+]
+
+
+def calcular_periodo(apps, schema_editor):
+    """Llena periodo (primer día del mes) en los registros existentes a partir de month/year"""
+    IngresoActividad = apps.get_model('administracion', 'IngresoActividad')
+
+    for mes_numero, mes in enumerate(MESES, start=1):
+        for year in IngresoActividad.objects.filter(month=mes, year__isnull=False).values_list('year', flat=True).order_by().distinct():
+            IngresoActividad.objects.filter(month=mes, year=year).update(periodo=date(year, mes_numero, 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_alter_ingresoactividad_actividad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingresoactividad',
+            name='periodo',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calcular_periodo, migrations.RunPython.noop),
+    ]
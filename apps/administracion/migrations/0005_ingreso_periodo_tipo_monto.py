@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_ingresoactividad_periodo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingresoactividad',
+            name='periodo',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ingresoactividad',
+            index=models.Index(fields=['periodo', 'tipo_ingreso', 'monto'], name='ingreso_periodo_tipo_monto'),
+        ),
+    ]
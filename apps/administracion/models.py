@@ -1,3 +1,4 @@
+from datetime import date
 from django.db import models
 
 class IngresoActividad(models.Model):
@@ -60,11 +61,33 @@ class IngresoActividad(models.Model):
     # Campos de timestamp (recomendados)
     fecha = models.DateTimeField(auto_now_add=True)
     
+    # Primer día del mes (month/year) para consultar ingresos por rango de fechas
+    periodo = models.DateField(null=True, blank=True, editable=False)
+    
     def __str__(self):
         return f"{self.actividad} - {self.monto} - {self.fecha}"
     
+    def save(self, *args, **kwargs):
+        self.periodo = periodo_desde_mes(self.month, self.year)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'month', 'year'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'periodo'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         
         verbose_name = "Ingreso de Actividad"
+        indexes = [
+            # Cubre la suma de ingresos por tipo en un rango de periodos sin leer la tabla
+            models.Index(fields=['periodo', 'tipo_ingreso', 'monto'], name='ingreso_periodo_tipo_monto'),
+        ]
         verbose_name_plural = "Ingresos de Actividades"
-        ordering = ['-fecha']
\ No newline at end of file
+        ordering = ['-fecha']
+
+
+def periodo_desde_mes(month, year):
+    """Primer día del mes a partir del nombre del mes en español y el año; None si falta alguno"""
+    meses = [mes for mes, _ in IngresoActividad.MONTHS]
+    if month not in meses or not year:
+        return None
+    return date(int(year), meses.index(month) + 1, 1)
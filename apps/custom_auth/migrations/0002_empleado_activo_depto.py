@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_auth', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='empleado',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['departamento'], name='empleado_activo_depto'),
+        ),
+    ]
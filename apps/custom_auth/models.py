@@ -26,6 +26,14 @@ class Empleado(models.Model):
     departamento = models.ForeignKey(Departamento, on_delete=models.SET_NULL, null=True, blank=True)
     email = models.EmailField(unique=True)
 
+    class Meta:
+        indexes = [
+            # Empleados activos por departamento (facturables) en los cálculos de KPIs. Es parcial
+            # porque Django filtra activo=True como WHERE "activo", que SQLite no busca en un índice
+            # (activo, departamento) pero sí reconoce como la condición de un índice parcial
+            models.Index(fields=['departamento'], condition=models.Q(activo=True), name='empleado_activo_depto'),
+        ]
+
     def __str__(self):
         return self.nombre_completo
    
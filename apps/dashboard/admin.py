@@ -1,7 +1,10 @@
 from django.contrib import admin
-from .models import KpiInputData, KpiTarget, Kpi
+from .models import DiaFeriado, KpiInputData, KpiSnapshot, KpiTarget, Kpi, VersionDatos
 
 # Register your models here.
 admin.site.register(KpiInputData)
 admin.site.register(Kpi)
-admin.site.register(KpiTarget)
\ No newline at end of file
+admin.site.register(KpiTarget)
+admin.site.register(DiaFeriado)
+admin.site.register(KpiSnapshot)
+admin.site.register(VersionDatos)
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dashboard.utils import KPIHistorial
+
+
+class Command(BaseCommand):
+    help = "Calcula y guarda los KPIs de los meses cerrados (KpiSnapshot) para las gráficas históricas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Mes inicial YYYY-MM (por defecto: primer mes con datos)")
+        parser.add_argument('--hasta', help="Mes final YYYY-MM (por defecto: último mes cerrado)")
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m').date() if options['desde'] else None
+            hasta = datetime.strptime(options['hasta'], '%Y-%m').date() if options['hasta'] else None
+        except ValueError:
+            raise CommandError("Los meses deben tener el formato YYYY-MM")
+
+        periodos = KPIHistorial.actualizar_historial(desde, hasta)
+
+        if not periodos:
+            self.stdout.write("No hay meses cerrados con datos para guardar")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Histórico de KPIs guardado: {len(periodos)} meses "
+            f"({periodos[0]:%Y-%m} a {periodos[-1]:%Y-%m})"
+        ))
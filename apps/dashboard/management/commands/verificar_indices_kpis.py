@@ -0,0 +1,92 @@
+import re
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.dashboard.utils import KPIBatch, KPICumplimiento, KPIDataCollector, KPIDesglose
+from apps.proyectos.models import ResumenDiarioHoras
+
+# Línea del plan de SQLite que recorre una tabla completa (las búsquedas por índice dicen SEARCH
+# y los recorridos de un índice cubriente dicen USING COVERING INDEX)
+RECORRIDO_COMPLETO = re.compile(r'^SCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)\s*$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las consultas de los cálculos de KPIs y revisa con EXPLAIN QUERY PLAN que usen "
+        "índices; falla si alguna recorre completa una tabla grande"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial YYYY-MM-DD (por defecto: un año antes de hasta)")
+        parser.add_argument('--hasta', help="Fecha final YYYY-MM-DD (por defecto: fecha actual)")
+        parser.add_argument(
+            '--minimo-filas', type=int, default=1000,
+            help="Tablas con menos filas pueden recorrerse completas sin error (por defecto: 1000)"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("La verificación interpreta planes de SQLite")
+
+        try:
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else date.today()
+            desde = (
+                datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde']
+                else hasta - timedelta(days=365)
+            )
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato YYYY-MM-DD")
+
+        consultas = {}
+        for nombre, calcular in self.calculos(desde, hasta):
+            with CaptureQueriesContext(connection) as capturadas:
+                calcular()
+            for consulta in capturadas.captured_queries:
+                if consulta['sql'].lstrip().upper().startswith('SELECT'):
+                    consultas.setdefault(consulta['sql'], nombre)
+
+        filas = {}
+        errores = 0
+        with connection.cursor() as cursor:
+            for sql, nombre in consultas.items():
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [fila[-1] for fila in cursor.fetchall()]
+
+                recorridos = []
+                for tabla in (m.group(1) for m in map(RECORRIDO_COMPLETO.match, plan) if m):
+                    if tabla not in filas:
+                        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(tabla)}")
+                        filas[tabla] = cursor.fetchone()[0]
+                    if filas[tabla] >= options['minimo_filas']:
+                        recorridos.append(tabla)
+
+                if recorridos:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(f"[{nombre}] recorre completa: {', '.join(recorridos)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"[{nombre}] OK"))
+                self.stdout.write(f"  {sql[:160]}")
+                for paso in plan:
+                    self.stdout.write(f"    {paso}")
+
+        if errores:
+            raise CommandError(f"{errores} de {len(consultas)} consultas recorren tablas completas")
+        self.stdout.write(self.style.SUCCESS(f"Las {len(consultas)} consultas de KPIs usan índices"))
+
+    @staticmethod
+    def calculos(desde, hasta):
+        """Cálculos de KPIs cuyas consultas se revisan, con el nombre con que se reportan"""
+        periodos = [(inicio, fin) for _, inicio, fin in KPIBatch.generar_periodos(desde, hasta)]
+        return [
+            ('KPIDataCollector', lambda: KPIDataCollector.collect_kpi_data(desde, hasta)),
+            ('KPIBatch', lambda: KPIBatch.collect_batch(periodos)),
+            ('KPICumplimiento', lambda: KPICumplimiento.calcular(desde, hasta)),
+            *[
+                (f'KPIDesglose {dimension}', lambda dimension=dimension: KPIDesglose.calcular(desde, hasta, dimension))
+                for dimension in KPIDesglose.DIMENSIONES
+            ],
+            ('ResumenDiarioHoras', lambda: list(ResumenDiarioHoras.totales_por_dia([desde, hasta]))),
+        ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_kpiinputdata_periodo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaFeriado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('nombre', models.CharField(max_length=100)),
+                ('planta', models.CharField(blank=True, default='', max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Día Feriado',
+                'ordering': ['fecha'],
+                'unique_together': {('fecha', 'planta')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_diaferiado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(unique=True)),
+                ('total_horas_facturables', models.FloatField(default=0)),
+                ('total_horas_facturadas', models.FloatField(default=0)),
+                ('total_horas_planta', models.FloatField(default=0)),
+                ('costo_por_hora', models.FloatField(default=0)),
+                ('ganancia_total', models.FloatField(default=0)),
+                ('numero_empleados', models.PositiveIntegerField(default=0)),
+                ('numero_empleados_facturables', models.PositiveIntegerField(default=0)),
+                ('dias_trabajados', models.PositiveIntegerField(default=0)),
+                ('costo_nomina_total', models.FloatField(default=0)),
+                ('ingresos_directos', models.FloatField(default=0)),
+                ('ingresos_indirectos', models.FloatField(default=0)),
+                ('valores', models.JSONField(default=dict)),
+                ('calculado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Histórico de KPIs',
+                'ordering': ['periodo'],
+            },
+        ),
+    ]
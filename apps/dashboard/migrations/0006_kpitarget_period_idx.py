@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_versiondatos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kpitarget',
+            index=models.Index(fields=['period'], name='kpitarget_period_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_kpitarget_period_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kpisnapshot',
+            name='versiones',
+            field=models.JSONField(default=dict),
+        ),
+    ]
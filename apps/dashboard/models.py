@@ -1,4 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from apps.administracion.models import periodo_desde_mes
 
 class Kpi(models.Model):
     """Definición de cada KPI con fórmulas específicas"""
@@ -34,6 +38,10 @@ class KpiTarget(models.Model):
         verbose_name = "Objetivo de KPI"
         ordering = ['kpi', 'period']
         unique_together = [['kpi', 'period']]
+        indexes = [
+            # Consultas de objetivos por rango de fechas, sin importar el KPI
+            models.Index(fields=['period'], name='kpitarget_period_idx'),
+        ]
     
     def __str__(self):
         return f"Objetivo {self.kpi.code} - {self.period}: {self.target_value}"
@@ -57,4 +65,103 @@ class KpiInputData(models.Model):
         ('Noviembre', 'Noviembre'),
         ('Diciembre', 'Diciembre')
     ])
-    year = models.IntegerField(null=True, blank=True , choices=[(i, i) for i in range(2000, 2100)])
\ No newline at end of file
+    year = models.IntegerField(null=True, blank=True , choices=[(i, i) for i in range(2000, 2100)])
+
+    # Primer día del mes (month/year), normalizado para filtrar por rango de fechas
+    periodo = models.DateField(null=True, blank=True, editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.periodo = periodo_desde_mes(self.month, self.year)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'month', 'year'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'periodo'}
+        super().save(*args, **kwargs)
+
+
+class KpiSnapshot(models.Model):
+    """Datos de entrada (KPIData) y valores de todos los KPIs de un mes cerrado"""
+    periodo = models.DateField(unique=True)  # Primer día del mes
+    total_horas_facturables = models.FloatField(default=0)
+    total_horas_facturadas = models.FloatField(default=0)
+    total_horas_planta = models.FloatField(default=0)
+    costo_por_hora = models.FloatField(default=0)
+    ganancia_total = models.FloatField(default=0)
+    numero_empleados = models.PositiveIntegerField(default=0)
+    numero_empleados_facturables = models.PositiveIntegerField(default=0)
+    dias_trabajados = models.PositiveIntegerField(default=0)
+    costo_nomina_total = models.FloatField(default=0)
+    ingresos_directos = models.FloatField(default=0)
+    ingresos_indirectos = models.FloatField(default=0)
+    # Valor de cada KPI por código, p. ej. {"ELDR": 1.25, "RE": 5400.0}
+    valores = models.JSONField(default=dict)
+    # Versiones de VersionDatos con las que se calculó; si ya no coinciden, el snapshot está obsoleto
+    versiones = models.JSONField(default=dict)
+    calculado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Histórico de KPIs"
+        ordering = ['periodo']
+
+    def __str__(self):
+        return f"KPIs {self.periodo:%Y-%m}"
+
+
+class DiaFeriado(models.Model):
+    """Días no laborables que no cuentan como días hábiles en los KPIs"""
+    fecha = models.DateField()
+    nombre = models.CharField(max_length=100)
+    # Vacío: aplica a todas las plantas
+    planta = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        verbose_name = "Día Feriado"
+        ordering = ['fecha']
+        unique_together = [['fecha', 'planta']]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.nombre}" + (f" ({self.planta})" if self.planta else "")
+
+
+class VersionDatos(models.Model):
+    """
+    Contador de cambios por tabla. El caché de KPIs incluye estas versiones en la
+    llave, así que un resultado guardado deja de usarse en cuanto cambian sus datos.
+    """
+    tabla = models.CharField(max_length=100, unique=True)  # app_label.modelo
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.tabla} v{self.version}"
+
+    @staticmethod
+    def incrementar(tabla):
+        """Incrementa la versión de una tabla al confirmarse la transacción en curso"""
+        def incrementar_version():
+            if not VersionDatos.objects.filter(tabla=tabla).update(version=F('version') + 1):
+                VersionDatos.objects.get_or_create(tabla=tabla, defaults={'version': 1})
+        transaction.on_commit(incrementar_version)
+
+
+# Modelos de los que dependen los KPIs calculados
+MODELOS_KPI = [
+    'proyectos.RegistroHoras',
+    'administracion.IngresoActividad',
+    'custom_auth.Empleado',
+    'custom_auth.Departamento',
+    'dashboard.DiaFeriado',
+]
+
+# Para escrituras masivas que no disparan post_save/post_delete (bulk_create, update, SQL directo):
+# datos_modificados.send(sender=Modelo)
+datos_modificados = Signal()
+
+
+@receiver(datos_modificados)
+def incrementar_version_datos(sender, **kwargs):
+    """Invalida los KPIs en caché que dependen del modelo modificado"""
+    VersionDatos.incrementar(sender._meta.label_lower)
+
+
+for modelo in MODELOS_KPI:
+    post_save.connect(incrementar_version_datos, sender=modelo, dispatch_uid=f'version_datos_save_{modelo}')
+    post_delete.connect(incrementar_version_datos, sender=modelo, dispatch_uid=f'version_datos_delete_{modelo}')
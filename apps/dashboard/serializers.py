@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from apps.dashboard.models import Kpi, KpiTarget, KpiInputData
+from apps.dashboard.models import Kpi, KpiTarget, KpiInputData, KpiSnapshot
 
 class KpiInputDataSerializer(serializers.ModelSerializer):
     """
@@ -35,7 +35,7 @@ class KpiTargetSerializer(serializers.ModelSerializer):
     
     def get_kpi_name(self, obj):
         """Retorna el nombre del KPI asociado."""
-        return obj.kpi.name if obj.kpi else None
+        return obj.kpi.get_code_display() if obj.kpi else None
     
     def validate(self, data):
         """
@@ -58,3 +58,11 @@ class KpiTargetSerializer(serializers.ModelSerializer):
         
         return data
 
+
+class KpiSnapshotSerializer(serializers.ModelSerializer):
+    """
+    Serializer para los KPIs guardados de un mes cerrado.
+    """
+    class Meta:
+        model = KpiSnapshot
+        exclude = ['id', 'versiones']
@@ -1,3 +1,81 @@
+from dataclasses import asdict
+from datetime import date
+
 from django.test import TestCase
 
-# Create your tests here.
+from apps.administracion.models import IngresoActividad
+from apps.custom_auth.models import Departamento, Empleado
+from apps.dashboard.models import DiaFeriado
+from apps.dashboard.utils import KPI_Calculator, KPIBatch, KPIDataCollector, _calendario_habil
+from apps.proyectos.models import RegistroHoras, ValorDimension
+
+
+class KPIBatchTests(TestCase):
+    """El cálculo por lotes debe dar lo mismo que KPI_Calculator período por período"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ingenieria = Departamento.objects.create(nombre='Ingenieria')
+        administracion = Departamento.objects.create(nombre='Administracion')
+        empleados = [
+            ('Ana Ruiz', ingenieria, date(2020, 5, 1), 30000),
+            ('Luis Soto', ingenieria, date(2024, 2, 15), 24000),
+            ('Marta Gil', administracion, date(2021, 1, 10), 18000),
+        ]
+        for numero, (nombre, departamento, contratacion, sueldo) in enumerate(empleados):
+            Empleado.objects.create(
+                nombre_completo=nombre, puesto='Ingeniero', departamento=departamento,
+                fecha_contratacion=contratacion, sueldo=sueldo, email=f'empleado{numero}@kep.mx'
+            )
+
+        for month, tipo, monto in [
+            ('Enero', 'Directo', 120000), ('Enero', 'Indirecto', 30000),
+            ('Febrero', 'Directo', 95000), ('Abril', 'Indirecto', 42000), ('Mayo', 'Directo', 88000),
+        ]:
+            IngresoActividad.objects.create(actividad='PLC', monto=monto, month=month, year=2024, tipo_ingreso=tipo)
+
+        DiaFeriado.objects.create(fecha=date(2024, 2, 5), nombre='Día de la Constitución')
+
+        for fecha, empleado, horas, ot in [
+            (date(2024, 1, 8), 'Ana Ruiz', 8, 'OT24-3-0200'),
+            (date(2024, 1, 9), 'Ana Ruiz', 6, ''),
+            (date(2024, 2, 20), 'Luis Soto', 7, 'OT24-3-0201'),
+            (date(2024, 4, 3), 'Ana Ruiz', 9, 'OT24-3-0200'),
+            (date(2024, 5, 31), 'Luis Soto', 5, 'OT24-3-0202'),
+        ]:
+            valores = {
+                'time_entry_status': 'Submitted', 'task': '04.01 Juntas', 'employee': empleado,
+                'employee_group': 'Control', 'manager': 'Laura Medina', 'ot': ot, 'planta': 'Planta Norte',
+            }
+            RegistroHoras.objects.create(
+                date=fecha, hours_worked=horas, project_status=True,
+                **{f'{dimension}_id': ValorDimension.ids(dimension, [valor])[valor] for dimension, valor in valores.items()}
+            )
+
+    def setUp(self):
+        # Dentro de la prueba no se confirma la transacción, así que la versión de los feriados no cambia
+        _calendario_habil.cache_clear()
+
+    def comparar(self, agrupacion):
+        resultado = KPIBatch.calcular(date(2024, 1, 1), date(2024, 6, 30), agrupacion)
+        calculadora = KPI_Calculator()
+        self.assertTrue(any(resultado['datos']['total_horas_planta']))
+        self.assertTrue(any(resultado['datos']['ganancia_total']))
+
+        for indice, periodo in enumerate(resultado['periodos']):
+            kpi_data = KPIDataCollector.collect_kpi_data(
+                date.fromisoformat(periodo['fecha_inicio']), date.fromisoformat(periodo['fecha_fin'])
+            )
+            with self.subTest(agrupacion=agrupacion, periodo=periodo['etiqueta']):
+                for campo, valor in asdict(kpi_data).items():
+                    self.assertAlmostEqual(resultado['datos'][campo][indice], valor, places=6, msg=campo)
+
+                for codigo, escalar in calculadora.calculate_all_KPIs(kpi_data).items():
+                    self.assertNotIn('error', escalar)
+                    self.assertAlmostEqual(resultado['kpis'][codigo][indice], escalar['valor'], places=2, msg=codigo)
+
+    def test_mensual(self):
+        self.comparar('mensual')
+
+    def test_trimestral(self):
+        self.comparar('trimestral')
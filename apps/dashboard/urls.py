@@ -17,8 +17,16 @@ urlpatterns = [
     path('kpi/goals/<int:kpi_goal_id>/edit/', views.edit_KPI_goal, name='edit_kpi_goal'),
     path('kpi/goals/<int:kpi_goal_id>/delete/', views.delete_KPI_goal, name='delete_kpi_goal'),
     path('kpi/goals/create/', views.create_KPI_target, name='create_kpi_target'),
+    path('kpi/goals/attainment/', views.cumplimiento_KPI_goals, name='cumplimiento_kpi_goals'),
+
+    # Histórico de KPIs de meses cerrados (antes de kpi/<str:kpi_name>/)
+    path('kpi/history/', views.historial_kpis, name='historial_kpis'),
 
     # Rutas para calculo de KPI
     path('kpi/<str:kpi_name>/', views.calcular_kpi, name='calcular_kpi'),
     path('calcular/todos/', views.calcular_todos_kpis, name='calcular_todos_kpis'),
+    path('calcular/periodos/', views.calcular_kpis_por_periodo, name='calcular_kpis_por_periodo'),
+    path('calcular/desglose/', views.desglose_kpis_horas, name='desglose_kpis_horas'),
+    path('calcular/escenarios/', views.calcular_escenarios_kpis, name='calcular_escenarios_kpis'),
+    path('calcular/cache/', views.estadisticas_cache_kpis, name='estadisticas_cache_kpis'),
 ]
\ No newline at end of file
@@ -1,9 +1,43 @@
 # apps/dashboard/utils.py
-from dataclasses import dataclass
-from datetime import datetime, date
+import calendar
+import hashlib
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, date, timedelta
+from functools import cached_property, lru_cache
+from types import SimpleNamespace
+import numpy as np
 from django.db.models import Sum, Q, Count, Avg
 from decimal import Decimal
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
+
+# Empleados facturables (departamentos de ingeniería/diseño)
+FILTRO_FACTURABLES = (
+    Q(departamento__nombre__icontains='Ingenieria') |
+    Q(departamento__nombre__icontains='Diseño')
+)
+
+def calendario_habil(planta: str = '') -> np.busdaycalendar:
+    """
+    Calendario de lunes a viernes sin los feriados generales ni los de la planta.
+    Se guarda en memoria por planta y versión de DiaFeriado (VersionDatos): cuando otro
+    proceso modifica los feriados, la versión cambia y aquí se vuelve a leer.
+    """
+    from apps.dashboard.models import DiaFeriado, VersionDatos
+    
+    version = VersionDatos.objects.filter(
+        tabla=DiaFeriado._meta.label_lower
+    ).values_list('version', flat=True).first() or 0
+    return _calendario_habil(planta, version)
+
+
+@lru_cache(maxsize=64)
+def _calendario_habil(planta: str, version: int) -> np.busdaycalendar:
+    """Calendario hábil de la planta con los feriados de la versión indicada"""
+    from apps.dashboard.models import DiaFeriado
+    
+    feriados = DiaFeriado.objects.filter(planta__in={'', planta}).values_list('fecha', flat=True)
+    return np.busdaycalendar(weekmask='1111100', holidays=np.array(list(feriados), dtype='datetime64[D]'))
+
 
 @dataclass
 class KPIData:
@@ -23,96 +57,90 @@ class KPIDataCollector:
     """Clase para recopilar datos reales de la base de datos para cálculos de KPI"""
     
     @staticmethod
-    def calcular_dias_habiles(fecha_inicio: date, fecha_fin: date):
-        """Calcula solo días hábiles (lunes a viernes) en el período"""
-        from datetime import timedelta
-        
-        dias_habiles = 0
-        fecha_actual = fecha_inicio
-        
-        while fecha_actual <= fecha_fin:
-            # 0=lunes, 6=domingo, entonces 0-4 son días hábiles
-            if fecha_actual.weekday() < 5:  
-                dias_habiles += 1
-            fecha_actual += timedelta(days=1)
+    def calcular_dias_habiles(fecha_inicio: date, fecha_fin: date, planta: str = ''):
+        """Calcula solo días hábiles (lunes a viernes, sin feriados) en el período, ambos extremos incluidos"""
+        if fecha_inicio > fecha_fin:
+            return 0
         
-        return dias_habiles
+        return int(np.busday_count(
+            fecha_inicio,
+            fecha_fin + timedelta(days=1),
+            busdaycal=calendario_habil(planta)
+        ))
     
     @staticmethod
     def get_empleados_data(fecha_inicio: date, fecha_fin: date):
-        """Obtiene información de empleados activos en el período"""
+        """
+        Obtiene información de empleados activos en el período con una sola consulta
+        de agregados condicionales sobre Empleado
+        """
         from apps.custom_auth.models import Empleado
         
-        empleados_activos = Empleado.objects.filter(
-            activo=True,
-            fecha_contratacion__lte=fecha_fin
-        )
+        contratados = Q(fecha_contratacion__lte=fecha_fin)
         
-        # Empleados facturables (departamentos de ingeniería/diseño)
-        empleados_facturables = empleados_activos.filter(
-            Q(departamento__nombre__icontains='Ingenieria') |
-            Q(departamento__nombre__icontains='Diseño') 
+        datos = Empleado.objects.filter(activo=True).aggregate(
+            total_empleados=Count('id', filter=contratados),
+            empleados_facturables=Count('id', filter=contratados & FILTRO_FACTURABLES),
+            nomina_total=Sum('sueldo', filter=contratados),
+            nomina_facturables=Sum('sueldo', filter=contratados & FILTRO_FACTURABLES),
+            # Para las horas facturables y el costo por hora no se filtra por fecha de contratación
+            facturables_activos=Count('id', filter=FILTRO_FACTURABLES),
+            salario_promedio_facturables=Avg('sueldo', filter=FILTRO_FACTURABLES),
         )
         
         return {
-            'total_empleados': empleados_activos.count(),
-            'empleados_facturables': empleados_facturables.count(),
-            'nomina_total': empleados_activos.aggregate(
-                total=Sum('sueldo')
-            )['total'] or 0,
-            'nomina_facturables': empleados_facturables.aggregate(
-                total=Sum('sueldo')
-            )['total'] or 0
+            'total_empleados': datos['total_empleados'],
+            'empleados_facturables': datos['empleados_facturables'],
+            'nomina_total': datos['nomina_total'] or 0,
+            'nomina_facturables': datos['nomina_facturables'] or 0,
+            'facturables_activos': datos['facturables_activos'],
+            'salario_promedio_facturables': datos['salario_promedio_facturables'] or 0,
         }
     
     @staticmethod
-    def get_horas_data(fecha_inicio: date, fecha_fin: date):
-        """Obtiene datos de horas trabajadas del RegistroHoras"""
-        from apps.proyectos.models import RegistroHoras
+    def get_horas_registradas(fecha_inicio: date, fecha_fin: date):
+        """Horas totales, horas facturadas y días con registros del resumen diario, en una sola consulta"""
+        from apps.proyectos.models import ResumenDiarioHoras
         
-        registros = RegistroHoras.objects.filter(
+        # El resumen diario solo tiene filas para días con registros
+        datos = ResumenDiarioHoras.objects.filter(
             date__gte=fecha_inicio,
             date__lte=fecha_fin,
+        ).aggregate(
+            # Horas totales trabajadas
+            total_horas=Sum('total_horas'),
+            # Horas FACTURADAS (solo proyectos con OT activos)
+            horas_facturadas=Sum('horas_facturadas'),
+            dias_unicos=Count('id'),
         )
         
-        # Horas totales trabajadas
-        total_horas = registros.aggregate(
-            total=Sum('hours_worked')
-        )['total'] or 0
+        return {
+            'total_horas': datos['total_horas'] or 0,
+            'horas_facturadas': datos['horas_facturadas'] or 0,
+            'dias_unicos': datos['dias_unicos'],
+        }
+    
+    @staticmethod
+    def get_horas_data(fecha_inicio: date, fecha_fin: date, empleados_data: Optional[Dict[str, Any]] = None):
+        """
+        Obtiene datos de horas trabajadas del resumen diario de RegistroHoras con una sola consulta.
+        empleados_data permite reutilizar lo ya calculado por get_empleados_data.
+        """
+        if empleados_data is None:
+            empleados_data = KPIDataCollector.get_empleados_data(fecha_inicio, fecha_fin)
         
-        # Horas FACTURADAS (solo proyectos con OT activos)
-        horas_facturadas = registros.filter(
-            project_status=True,
-            ot__isnull=False
-        ).exclude(ot='').aggregate(
-            total=Sum('hours_worked')
-        )['total'] or 0
+        datos = KPIDataCollector.get_horas_registradas(fecha_inicio, fecha_fin)
+        total_horas = datos['total_horas']
+        horas_facturadas = datos['horas_facturadas']
         
         # Calcular días hábiles en el período
         dias_habiles = KPIDataCollector.calcular_dias_habiles(fecha_inicio, fecha_fin)
         
-        # Empleados facturables
-        from apps.custom_auth.models import Empleado
-        
-        empleados_facturables_count = Empleado.objects.filter(
-            Q(departamento__nombre__icontains='Ingenieria') |
-            Q(departamento__nombre__icontains='Diseño'),
-            activo=True
-        ).count()
-        
         # Horas FACTURABLES: solo días hábiles × empleados × 8.5 horas
-        horas_facturables = empleados_facturables_count * dias_habiles * 8.5
+        horas_facturables = empleados_data['facturables_activos'] * dias_habiles * 8.5
         
         # COSTO POR HORA promedio basado en salarios mensuales
-        empleados_facturables = Empleado.objects.filter(
-            Q(departamento__nombre__icontains='Ingenieria') |
-            Q(departamento__nombre__icontains='Diseño'),
-            activo=True
-        )
-        
-        salario_promedio_mensual = empleados_facturables.aggregate(
-            promedio=Avg('sueldo')
-        )['promedio'] or 0
+        salario_promedio_mensual = empleados_data['salario_promedio_facturables']
         
         # Horas mensuales estándar: 22 días hábiles × 8.5 horas
         horas_mensuales_estandar = 22 * 8.5
@@ -124,7 +152,7 @@ class KPIDataCollector:
             'total_horas_planta': float(total_horas),
             'total_horas_facturables': float(horas_facturables),
             'total_horas_facturadas': float(horas_facturadas),
-            'dias_unicos_trabajados': registros.values('date').distinct().count(),
+            'dias_unicos_trabajados': datos['dias_unicos'],
             'dias_habiles_periodo': dias_habiles,
             'costo_por_hora_promedio': float(costo_por_hora_promedio),
             'salario_promedio_mensual': float(salario_promedio_mensual)
@@ -132,39 +160,23 @@ class KPIDataCollector:
     
     @staticmethod
     def get_ingresos_data(fecha_inicio: date, fecha_fin: date):
-        """Obtiene datos de ingresos de IngresoActividad"""
+        """
+        Obtiene datos de ingresos de IngresoActividad con una consulta por rango sobre
+        periodo (primer día de cada mes), agrupada por tipo de ingreso
+        """
         from apps.administracion.models import IngresoActividad
         
-        # Mapear fechas a mes/año
-        meses_periodo = []
-        fecha_actual = fecha_inicio.replace(day=1)
-        while fecha_actual <= fecha_fin:
-            mes_nombre = [
-                'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre'
-            ][fecha_actual.month - 1]
-            meses_periodo.append((mes_nombre, fecha_actual.year))
-            
-            # Siguiente mes
-            if fecha_actual.month == 12:
-                fecha_actual = fecha_actual.replace(year=fecha_actual.year + 1, month=1)
-            else:
-                fecha_actual = fecha_actual.replace(month=fecha_actual.month + 1)
-        
-        ingresos_directos = 0
-        ingresos_indirectos = 0
-        
-        for mes, año in meses_periodo:
-            ingresos_mes = IngresoActividad.objects.filter(
-                month=mes,
-                year=año
-            ).aggregate(
-                directos=Sum('monto', filter=Q(tipo_ingreso='Directo')),
-                indirectos=Sum('monto', filter=Q(tipo_ingreso='Indirecto'))
-            )
-            
-            ingresos_directos += ingresos_mes['directos'] or 0
-            ingresos_indirectos += ingresos_mes['indirectos'] or 0
+        # Se incluyen todos los meses que toca el período, aunque sea parcialmente
+        totales = dict(
+            IngresoActividad.objects.filter(
+                periodo__gte=fecha_inicio.replace(day=1),
+                periodo__lte=fecha_fin
+            ).values('tipo_ingreso').annotate(total=Sum('monto')).order_by()
+            .values_list('tipo_ingreso', 'total')
+        )
+        
+        ingresos_directos = totales.get('Directo') or 0
+        ingresos_indirectos = totales.get('Indirecto') or 0
             
         return {
             'ingresos_directos': float(ingresos_directos),
@@ -172,124 +184,235 @@ class KPIDataCollector:
             'ganancia_total': float(ingresos_directos + ingresos_indirectos)
         }
     
+    @classmethod
+    def datos_perezosos(cls, fecha_inicio: date, fecha_fin: date,
+                        costo_hora_promedio: float = 250.0) -> 'KPIDataPerezoso':
+        """Datos de KPIs que solo consultan la base de datos para los campos que se lean"""
+        return KPIDataPerezoso(fecha_inicio, fecha_fin, costo_hora_promedio)
+    
     @classmethod
     def collect_kpi_data(cls, fecha_inicio: date, fecha_fin: date, 
                         costo_hora_promedio: float = 250.0) -> KPIData:
         """Método principal para recopilar todos los datos necesarios para KPIs"""
-        
-        empleados_data = cls.get_empleados_data(fecha_inicio, fecha_fin)
-        horas_data = cls.get_horas_data(fecha_inicio, fecha_fin)
-        ingresos_data = cls.get_ingresos_data(fecha_inicio, fecha_fin)
-        
-        # Usar el costo por hora calculado basado en salarios
-        costo_calculado = horas_data['costo_por_hora_promedio'] if horas_data['costo_por_hora_promedio'] > 0 else costo_hora_promedio
-        
-        return KPIData(
-            total_horas_facturables=horas_data['total_horas_facturables'],
-            total_horas_facturadas=horas_data['total_horas_facturadas'],
-            total_horas_planta=horas_data['total_horas_planta'],
-            costo_por_hora=costo_calculado,
-            ganancia_total=ingresos_data['ganancia_total'],
-            numero_empleados=empleados_data['total_empleados'],
-            numero_empleados_facturables=empleados_data['empleados_facturables'],
-            dias_trabajados=horas_data['dias_habiles_periodo'],  # Usar días hábiles
-            costo_nomina_total=empleados_data['nomina_total'],
-            ingresos_directos=ingresos_data['ingresos_directos'],
-            ingresos_indirectos=ingresos_data['ingresos_indirectos']
-        )
+        return cls.datos_perezosos(fecha_inicio, fecha_fin, costo_hora_promedio).a_kpi_data()
+
+
+class KPIDataPerezoso:
+    """
+    Mismos campos que KPIData, calculados la primera vez que se leen. Cada grupo de
+    consultas (empleados, horas, ingresos) se ejecuta a lo más una vez, así que un KPI
+    solo paga las consultas de los campos de los que depende.
+    """
+    
+    def __init__(self, fecha_inicio: date, fecha_fin: date, costo_hora_promedio: float = 250.0):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.costo_hora_promedio = costo_hora_promedio
+    
+    @cached_property
+    def _empleados(self):
+        return KPIDataCollector.get_empleados_data(self.fecha_inicio, self.fecha_fin)
+    
+    @cached_property
+    def _horas(self):
+        return KPIDataCollector.get_horas_registradas(self.fecha_inicio, self.fecha_fin)
+    
+    @cached_property
+    def _ingresos(self):
+        return KPIDataCollector.get_ingresos_data(self.fecha_inicio, self.fecha_fin)
+    
+    @cached_property
+    def dias_trabajados(self) -> int:
+        # Usar días hábiles
+        return KPIDataCollector.calcular_dias_habiles(self.fecha_inicio, self.fecha_fin)
+    
+    @cached_property
+    def total_horas_facturables(self) -> float:
+        # Horas FACTURABLES: solo días hábiles × empleados × 8.5 horas
+        return float(self._empleados['facturables_activos'] * self.dias_trabajados * 8.5)
+    
+    @cached_property
+    def total_horas_facturadas(self) -> float:
+        return float(self._horas['horas_facturadas'])
+    
+    @cached_property
+    def total_horas_planta(self) -> float:
+        return float(self._horas['total_horas'])
+    
+    @cached_property
+    def costo_por_hora(self) -> float:
+        # Costo por hora = salario mensual promedio / horas mensuales estándar (22 días × 8.5 horas)
+        costo_calculado = float(self._empleados['salario_promedio_facturables'] / (22 * 8.5))
+        return costo_calculado if costo_calculado > 0 else self.costo_hora_promedio
+    
+    @cached_property
+    def ganancia_total(self) -> float:
+        return self._ingresos['ganancia_total']
+    
+    @cached_property
+    def ingresos_directos(self) -> float:
+        return self._ingresos['ingresos_directos']
+    
+    @cached_property
+    def ingresos_indirectos(self) -> float:
+        return self._ingresos['ingresos_indirectos']
+    
+    @cached_property
+    def numero_empleados(self) -> int:
+        return self._empleados['total_empleados']
+    
+    @cached_property
+    def numero_empleados_facturables(self) -> int:
+        return self._empleados['empleados_facturables']
+    
+    @cached_property
+    def costo_nomina_total(self) -> float:
+        return self._empleados['nomina_total']
+    
+    def a_kpi_data(self) -> KPIData:
+        """Calcula todos los campos y los regresa como KPIData"""
+        return KPIData(**{campo.name: getattr(self, campo.name) for campo in fields(KPIData)})
+
+
+@dataclass(frozen=True)
+class KPIDefinicion:
+    """Un KPI registrado: su fórmula y los campos de KPIData que usa"""
+    codigo: str
+    nombre: str
+    campos: tuple
+    formula: Callable
+
+
+# KPIs disponibles por código, en el orden en que se registraron
+REGISTRO_KPIS: Dict[str, KPIDefinicion] = {}
+
+
+def registrar_kpi(codigo: str, nombre: str, campos):
+    """
+    Decorador que registra una fórmula de KPI. La fórmula recibe un objeto con los campos
+    de KPIData como atributos, ya sean escalares o arreglos de NumPy (un valor por período),
+    y debe funcionar con ambos.
+    """
+    desconocidos = set(campos) - {campo.name for campo in fields(KPIData)}
+    if desconocidos:
+        raise ValueError(f"Campos de KPIData desconocidos para {codigo}: {sorted(desconocidos)}")
+    
+    def decorador(formula):
+        REGISTRO_KPIS[codigo.upper()] = KPIDefinicion(codigo.upper(), nombre, tuple(campos), formula)
+        return formula
+    return decorador
+
+
+def dividir(numerador, denominador):
+    """División elemento a elemento que da 0 donde el denominador es 0, igual que las fórmulas escalares"""
+    numerador, denominador = np.broadcast_arrays(
+        np.asarray(numerador, dtype=float), np.asarray(denominador, dtype=float)
+    )
+    resultado = np.zeros(numerador.shape)
+    np.divide(numerador, denominador, out=resultado, where=denominador != 0)
+    return resultado[()]
+
 
 class KPI_Calculator:
     """Calculadora mejorada de KPIs con fórmulas corregidas"""
     
     @staticmethod
+    @registrar_kpi('ELDR', 'Earnings per Labor Dollar Rate', ['ganancia_total', 'costo_nomina_total'])
     def ELDR(kpi_data: KPIData) -> float:
         """Earnings per Labor Dollar Rate"""
-        if kpi_data.costo_nomina_total == 0:
-            return 0
-        return kpi_data.ganancia_total / kpi_data.costo_nomina_total
+        return dividir(kpi_data.ganancia_total, kpi_data.costo_nomina_total)
     
     @staticmethod
+    @registrar_kpi('RE', 'Revenue per Employee', ['ganancia_total', 'numero_empleados'])
     def RE(kpi_data: KPIData) -> float:
         """Revenue per Employee"""
-        if kpi_data.numero_empleados == 0:
-            return 0
-        return kpi_data.ganancia_total / kpi_data.numero_empleados
+        return dividir(kpi_data.ganancia_total, kpi_data.numero_empleados)
     
     @staticmethod
+    @registrar_kpi('RBE', 'Revenue per Billable Employee', ['ganancia_total', 'numero_empleados_facturables'])
     def RBE(kpi_data: KPIData) -> float:
         """Revenue per Billable Employee"""
-        if kpi_data.numero_empleados_facturables == 0:
-            return 0
-        return kpi_data.ganancia_total / kpi_data.numero_empleados_facturables
+        return dividir(kpi_data.ganancia_total, kpi_data.numero_empleados_facturables)
     
     @staticmethod
+    @registrar_kpi('UBH', 'Utilization Billable Hours', ['total_horas_facturadas', 'total_horas_facturables'])
     def UBH(kpi_data: KPIData) -> float:
         """Utilization Billable Hours - % de horas facturadas vs horas facturables"""
-        if kpi_data.total_horas_facturables == 0:
-            return 0
-        return (kpi_data.total_horas_facturadas / kpi_data.total_horas_facturables) * 100
+        return dividir(kpi_data.total_horas_facturadas, kpi_data.total_horas_facturables) * 100
     
     @staticmethod
+    @registrar_kpi('UB', 'Utilization Benchmark', ['total_horas_facturables', 'total_horas_planta'])
     def UB(kpi_data: KPIData) -> float:
         """Utilization Benchmark - % de horas facturables vs horas totales de planta"""
-        if kpi_data.total_horas_planta == 0:
-            return 0
-        return (kpi_data.total_horas_facturables / kpi_data.total_horas_planta) * 100
+        return dividir(kpi_data.total_horas_facturables, kpi_data.total_horas_planta) * 100
     
     @staticmethod
+    @registrar_kpi('LM', 'Labor Multiplier', ['ganancia_total', 'total_horas_facturadas', 'costo_por_hora'])
     def LM(kpi_data: KPIData) -> float:
         """Labor Multiplier"""
         costo_total_labor = kpi_data.total_horas_facturadas * kpi_data.costo_por_hora
-        if costo_total_labor == 0:
-            return 0
-        return kpi_data.ganancia_total / costo_total_labor
+        return dividir(kpi_data.ganancia_total, costo_total_labor)
     
     @staticmethod
+    @registrar_kpi('LMM', 'Labor Maximum Multiplier', ['numero_empleados_facturables', 'dias_trabajados'])
     def LMM(kpi_data: KPIData) -> float:
         """Labor Maximum Multiplier - Horas máximas facturables por empleado en días hábiles"""
-        if kpi_data.numero_empleados_facturables == 0:
-            return 0
         # Solo días hábiles × 8.5 horas por empleado facturable
-        return 8.5 * kpi_data.numero_empleados_facturables * kpi_data.dias_trabajados
+        return np.where(
+            np.asarray(kpi_data.numero_empleados_facturables) == 0,
+            0.0,
+            8.5 * np.asarray(kpi_data.numero_empleados_facturables) * kpi_data.dias_trabajados
+        )[()]
     
-    def calculate_KPI(self, kpi_name: str, kpi_data: KPIData) -> Dict[str, Any]:
-        """Calcula un KPI específico y retorna información detallada"""
-        kpi_methods = {
-            'ELDR': self.ELDR,
-            'RE': self.RE,
-            'RBE': self.RBE,
-            'UBH': self.UBH,
-            'UB': self.UB,
-            'LM': self.LM,
-            'LMM': self.LMM
+    # Cómo se muestra cada campo en 'datos_utilizados'
+    ETIQUETAS_DATOS = {
+        'numero_empleados': 'empleados_total',
+        'numero_empleados_facturables': 'empleados_facturables',
+        'total_horas_planta': 'horas_planta',
+        'total_horas_facturables': 'horas_facturables',
+        'total_horas_facturadas': 'horas_facturadas',
+    }
+    
+    # Campos de 'datos_utilizados' cuando se tienen todos los datos (KPIData completo)
+    CAMPOS_DATOS = [
+        'numero_empleados', 'numero_empleados_facturables', 'total_horas_planta',
+        'total_horas_facturables', 'total_horas_facturadas', 'ganancia_total', 'costo_por_hora',
+    ]
+    
+    def datos_utilizados(self, definicion: KPIDefinicion, kpi_data) -> Dict[str, Any]:
+        """
+        Datos mostrados junto al valor del KPI. Con un KPIData completo son siempre los mismos
+        campos, sin importar el KPI. Con KPIDataPerezoso (cálculo de un solo KPI) son solo los
+        campos de los que depende el KPI, para no ejecutar las consultas de los demás.
+        """
+        campos = definicion.campos if isinstance(kpi_data, KPIDataPerezoso) else self.CAMPOS_DATOS
+        return {
+            'periodo_analizado': f"{kpi_data.dias_trabajados} días hábiles",
+            **{self.ETIQUETAS_DATOS.get(campo, campo): getattr(kpi_data, campo) for campo in campos},
         }
+    
+    def calculate_KPI(self, kpi_name: str, kpi_data: KPIData) -> Dict[str, Any]:
+        """
+        Calcula un KPI registrado y retorna información detallada. Con KPIDataPerezoso
+        solo lee los campos de los que depende el KPI (ver datos_utilizados).
+        """
+        definicion = REGISTRO_KPIS.get(kpi_name.upper())
+        if definicion is None:
+            raise ValueError(f"KPI '{kpi_name}' no encontrado. KPIs disponibles: {list(REGISTRO_KPIS)}")
         
-        if kpi_name.upper() not in kpi_methods:
-            raise ValueError(f"KPI '{kpi_name}' no encontrado. KPIs disponibles: {list(kpi_methods.keys())}")
-        
-        valor = kpi_methods[kpi_name.upper()](kpi_data)
+        valor = float(definicion.formula(kpi_data))
         
         return {
-            'kpi': kpi_name.upper(),
+            'kpi': definicion.codigo,
             'valor': round(valor, 2),
-            'datos_utilizados': {
-                'periodo_analizado': f"{kpi_data.dias_trabajados} días hábiles",
-                'empleados_total': kpi_data.numero_empleados,
-                'empleados_facturables': kpi_data.numero_empleados_facturables,
-                'horas_planta': kpi_data.total_horas_planta,
-                'horas_facturables': kpi_data.total_horas_facturables,
-                'horas_facturadas': kpi_data.total_horas_facturadas,
-                'ganancia_total': kpi_data.ganancia_total,
-                'costo_por_hora': kpi_data.costo_por_hora
-            }
+            'datos_utilizados': self.datos_utilizados(definicion, kpi_data),
         }
     
     def calculate_all_KPIs(self, kpi_data: KPIData) -> Dict[str, Any]:
-        """Calcula todos los KPIs disponibles"""
-        kpis = ['ELDR', 'RE', 'RBE', 'UBH', 'UB', 'LM', 'LMM']
+        """Calcula todos los KPIs registrados"""
         resultados = {}
         
-        for kpi in kpis:
+        for kpi in REGISTRO_KPIS:
             try:
                 resultados[kpi] = self.calculate_KPI(kpi, kpi_data)
             except Exception as e:
@@ -299,4 +422,570 @@ class KPI_Calculator:
                     'valor': 0
                 }
         
-        return resultados
\ No newline at end of file
+        return resultados
+
+
+class KPIHistorial:
+    """Guarda y consulta los KPIs de meses cerrados (KpiSnapshot) para las gráficas históricas"""
+    
+    @staticmethod
+    def fin_de_mes(periodo: date) -> date:
+        """Último día del mes de periodo"""
+        return periodo.replace(day=calendar.monthrange(periodo.year, periodo.month)[1])
+    
+    @staticmethod
+    def meses(desde: date, hasta: date):
+        """Primer día de cada mes entre desde y hasta, ambos incluidos"""
+        periodo = desde.replace(day=1)
+        while periodo <= hasta:
+            yield periodo
+            periodo = (periodo + timedelta(days=32)).replace(day=1)
+    
+    @staticmethod
+    def ultimo_mes_cerrado(hoy: Optional[date] = None) -> date:
+        """Primer día del último mes que ya terminó"""
+        hoy = hoy or date.today()
+        return (hoy.replace(day=1) - timedelta(days=1)).replace(day=1)
+    
+    @staticmethod
+    def guardar_snapshot(periodo: date):
+        """Calcula los datos y todos los KPIs de un mes y los guarda en KpiSnapshot"""
+        from apps.dashboard.models import KpiSnapshot
+        
+        periodo = periodo.replace(day=1)
+        # Se leen antes de calcular: si los datos cambian durante el cálculo, el snapshot queda obsoleto
+        versiones = KPICache.versiones()
+        kpi_data = KPIDataCollector.collect_kpi_data(periodo, KPIHistorial.fin_de_mes(periodo))
+        resultados = KPI_Calculator().calculate_all_KPIs(kpi_data)
+        
+        snapshot, _ = KpiSnapshot.objects.update_or_create(
+            periodo=periodo,
+            defaults={
+                **asdict(kpi_data),
+                'valores': {codigo: resultado['valor'] for codigo, resultado in resultados.items()},
+                'versiones': versiones,
+            }
+        )
+        return snapshot
+    
+    @staticmethod
+    def refrescar_obsoletos(desde: date, hasta: date):
+        """
+        Vuelve a calcular los snapshots entre desde y hasta cuyos datos cambiaron después de
+        guardarlos (ingresos, empleados, feriados u horas editados fuera de una carga).
+        Retorna los meses recalculados.
+        """
+        from apps.dashboard.models import KpiSnapshot
+        
+        versiones = KPICache.versiones()
+        periodos = [
+            periodo for periodo, guardadas in
+            KpiSnapshot.objects.filter(periodo__gte=desde, periodo__lte=hasta).values_list('periodo', 'versiones')
+            if guardadas != versiones
+        ]
+        for periodo in periodos:
+            KPIHistorial.guardar_snapshot(periodo)
+        return periodos
+    
+    @staticmethod
+    def actualizar_historial(desde: Optional[date] = None, hasta: Optional[date] = None):
+        """
+        Guarda los snapshots de los meses cerrados entre desde y hasta. Sin desde, se
+        empieza en el primer mes con horas o ingresos registrados. Retorna los meses guardados.
+        """
+        from apps.administracion.models import IngresoActividad
+        from apps.proyectos.models import ResumenDiarioHoras
+        
+        ultimo_cerrado = KPIHistorial.ultimo_mes_cerrado()
+        hasta = min(hasta or ultimo_cerrado, ultimo_cerrado)
+        
+        if desde is None:
+            inicios = [
+                fecha for fecha in (
+                    ResumenDiarioHoras.objects.order_by('date').values_list('date', flat=True).first(),
+                    IngresoActividad.objects.filter(periodo__isnull=False)
+                    .order_by('periodo').values_list('periodo', flat=True).first(),
+                ) if fecha
+            ]
+            if not inicios:
+                return []
+            desde = min(inicios)
+        
+        periodos = list(KPIHistorial.meses(desde, hasta))
+        for periodo in periodos:
+            KPIHistorial.guardar_snapshot(periodo)
+        return periodos
+
+
+class KPIBatch:
+    """
+    Cálculo de KPIs para varios períodos a la vez: una consulta por tabla para todos
+    los períodos y las fórmulas evaluadas como operaciones de NumPy sobre arreglos
+    """
+    
+    # Meses que abarca cada período según la agrupación
+    AGRUPACIONES = {
+        'mensual': 1,
+        'trimestral': 3,
+        'anual': 12,
+    }
+    
+    @staticmethod
+    def generar_periodos(fecha_inicio: date, fecha_fin: date, agrupacion: str = 'mensual',
+                         mes_inicio_fiscal: int = 1):
+        """
+        Divide el rango en períodos mensuales, trimestrales o de año fiscal (que empieza en
+        mes_inicio_fiscal). El primero y el último se recortan al rango.
+        Retorna una lista de (etiqueta, fecha_inicio, fecha_fin).
+        """
+        if agrupacion not in KPIBatch.AGRUPACIONES:
+            raise ValueError(f"Agrupación '{agrupacion}' no válida. Opciones: {list(KPIBatch.AGRUPACIONES)}")
+        if not 1 <= mes_inicio_fiscal <= 12:
+            raise ValueError("El mes de inicio fiscal debe estar entre 1 y 12")
+        
+        meses = KPIBatch.AGRUPACIONES[agrupacion]
+        ancla = mes_inicio_fiscal - 1 if agrupacion == 'anual' else 0
+        
+        # Meses transcurridos desde el año 0 hasta el inicio del período que contiene fecha_inicio
+        indice = fecha_inicio.year * 12 + fecha_inicio.month - 1 - ancla
+        indice -= indice % meses
+        
+        periodos = []
+        while True:
+            año, mes = divmod(indice + ancla, 12)
+            inicio = date(año, mes + 1, 1)
+            if inicio > fecha_fin:
+                break
+            año, mes = divmod(indice + ancla + meses, 12)
+            fin = date(año, mes + 1, 1) - timedelta(days=1)
+            
+            if agrupacion == 'mensual':
+                etiqueta = f"{inicio:%Y-%m}"
+            elif agrupacion == 'trimestral':
+                etiqueta = f"{inicio.year}-T{(inicio.month - 1) // 3 + 1}"
+            else:
+                # El año fiscal se nombra por el año en que termina
+                etiqueta = f"AF{fin.year}"
+            
+            periodos.append((etiqueta, max(inicio, fecha_inicio), min(fin, fecha_fin)))
+            indice += meses
+        
+        return periodos
+    
+    @staticmethod
+    def collect_batch(periodos, costo_hora_promedio: float = 250.0) -> Dict[str, np.ndarray]:
+        """
+        Datos de KPIData para cada período de la lista de (fecha_inicio, fecha_fin), como
+        arreglos con un elemento por período. Cada tabla se consulta una sola vez, agrupada,
+        y los totales de cada período se obtienen con máscaras de fechas.
+        """
+        from apps.administracion.models import IngresoActividad
+        from apps.custom_auth.models import Empleado
+        from apps.proyectos.models import ResumenDiarioHoras
+        
+        inicios = np.array([inicio for inicio, _ in periodos], dtype='datetime64[D]')
+        fines = np.array([fin for _, fin in periodos], dtype='datetime64[D]')
+        
+        # Empleados activos agrupados por fecha de contratación
+        empleados = list(
+            Empleado.objects.filter(activo=True).values('fecha_contratacion').annotate(
+                total=Count('id'),
+                facturables=Count('id', filter=FILTRO_FACTURABLES),
+                nomina=Sum('sueldo'),
+                nomina_facturables=Sum('sueldo', filter=FILTRO_FACTURABLES),
+            ).order_by()
+        )
+        contratacion = np.array([fila['fecha_contratacion'] for fila in empleados], dtype='datetime64[D]')
+        total = np.array([fila['total'] for fila in empleados], dtype='int64')
+        facturables = np.array([fila['facturables'] for fila in empleados], dtype='int64')
+        nomina = np.array([fila['nomina'] or 0 for fila in empleados], dtype='int64')
+        nomina_facturables = np.array([fila['nomina_facturables'] or 0 for fila in empleados], dtype='int64')
+        
+        contratados = contratacion[np.newaxis, :] <= fines[:, np.newaxis]
+        numero_empleados = contratados @ total
+        numero_empleados_facturables = contratados @ facturables
+        costo_nomina_total = contratados @ nomina
+        
+        # Capacidad y costo por hora no filtran por fecha de contratación
+        facturables_activos = int(facturables.sum())
+        salario_promedio = int(nomina_facturables.sum()) / facturables_activos if facturables_activos else 0
+        costo_por_hora = salario_promedio / (22 * 8.5)
+        
+        # Horas por día del resumen diario
+        dias = list(
+            ResumenDiarioHoras.objects.filter(
+                date__gte=inicios.min().item(),
+                date__lte=fines.max().item(),
+            ).values_list('date', 'total_horas', 'horas_facturadas')
+        )
+        fechas = np.array([fila[0] for fila in dias], dtype='datetime64[D]')
+        en_periodo = (fechas[np.newaxis, :] >= inicios[:, np.newaxis]) & (fechas[np.newaxis, :] <= fines[:, np.newaxis])
+        total_horas_planta = en_periodo @ np.array([fila[1] for fila in dias], dtype='int64')
+        total_horas_facturadas = en_periodo @ np.array([fila[2] for fila in dias], dtype='int64')
+        
+        dias_habiles = np.busday_count(inicios, fines + 1, busdaycal=calendario_habil())
+        
+        # Ingresos por mes y tipo; cada período incluye los meses que toca
+        inicios_mes = inicios.astype('datetime64[M]').astype('datetime64[D]')
+        ingresos = list(
+            IngresoActividad.objects.filter(
+                periodo__gte=inicios_mes.min().item(),
+                periodo__lte=fines.max().item(),
+            ).values('periodo', 'tipo_ingreso').annotate(total=Sum('monto')).order_by()
+        )
+        meses = np.array([fila['periodo'] for fila in ingresos], dtype='datetime64[D]')
+        montos = np.array([fila['total'] for fila in ingresos], dtype=float)
+        tipos = np.array([fila['tipo_ingreso'] for fila in ingresos], dtype=object)
+        en_periodo = (meses[np.newaxis, :] >= inicios_mes[:, np.newaxis]) & (meses[np.newaxis, :] <= fines[:, np.newaxis])
+        ingresos_directos = en_periodo @ np.where(tipos == 'Directo', montos, 0.0)
+        ingresos_indirectos = en_periodo @ np.where(tipos == 'Indirecto', montos, 0.0)
+        
+        n = len(periodos)
+        return {
+            'total_horas_facturables': (facturables_activos * dias_habiles * 8.5).astype(float),
+            'total_horas_facturadas': total_horas_facturadas.astype(float),
+            'total_horas_planta': total_horas_planta.astype(float),
+            'costo_por_hora': np.full(n, costo_por_hora if costo_por_hora > 0 else costo_hora_promedio, dtype=float),
+            'ganancia_total': ingresos_directos + ingresos_indirectos,
+            'numero_empleados': numero_empleados,
+            'numero_empleados_facturables': numero_empleados_facturables,
+            'dias_trabajados': dias_habiles.astype('int64'),
+            'costo_nomina_total': costo_nomina_total,
+            'ingresos_directos': ingresos_directos,
+            'ingresos_indirectos': ingresos_indirectos,
+        }
+    
+    @staticmethod
+    def calcular_kpis(datos: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Las fórmulas registradas evaluadas sobre los arreglos de collect_batch"""
+        campos = SimpleNamespace(**datos)
+        n = len(next(iter(datos.values())))
+        return {
+            codigo: np.broadcast_to(np.asarray(definicion.formula(campos), dtype=float), (n,))
+            for codigo, definicion in REGISTRO_KPIS.items()
+        }
+    
+    @staticmethod
+    def calcular(fecha_inicio: date, fecha_fin: date, agrupacion: str = 'mensual',
+                 mes_inicio_fiscal: int = 1, costo_hora_promedio: float = 250.0) -> Dict[str, Any]:
+        """Calcula todos los KPIs de cada período del rango y los regresa como series"""
+        periodos = KPIBatch.generar_periodos(fecha_inicio, fecha_fin, agrupacion, mes_inicio_fiscal)
+        datos = KPIBatch.collect_batch([(inicio, fin) for _, inicio, fin in periodos], costo_hora_promedio)
+        kpis = KPIBatch.calcular_kpis(datos)
+        
+        return {
+            'periodos': [
+                {'etiqueta': etiqueta, 'fecha_inicio': inicio.isoformat(), 'fecha_fin': fin.isoformat()}
+                for etiqueta, inicio, fin in periodos
+            ],
+            'kpis': {codigo: [round(valor, 2) for valor in valores.tolist()] for codigo, valores in kpis.items()},
+            'datos': {campo: valores.tolist() for campo, valores in datos.items()},
+        }
+
+
+class KPICumplimiento:
+    """Compara los KPIs de cada mes con sus objetivos (KpiTarget)"""
+    
+    @staticmethod
+    def calcular(desde: date, hasta: date, codigos=None):
+        """
+        Valor, objetivo, banda mínima/máxima y estado de cada KpiTarget con período entre
+        desde y hasta. Cada objetivo se compara con el KPI del mes de su período; los
+        valores de todos los meses se calculan juntos con KPIBatch.
+        """
+        from apps.dashboard.models import KpiTarget
+        
+        objetivos = KpiTarget.objects.filter(period__gte=desde, period__lte=hasta).select_related('kpi')
+        if codigos:
+            objetivos = objetivos.filter(kpi__code__in=codigos)
+        objetivos = list(objetivos.order_by('period', 'kpi__code'))
+        if not objetivos:
+            return []
+        
+        meses = sorted({objetivo.period.replace(day=1) for objetivo in objetivos})
+        datos = KPIBatch.collect_batch([(mes, KPIHistorial.fin_de_mes(mes)) for mes in meses])
+        valores_kpis = KPIBatch.calcular_kpis(datos)
+        indice_mes = {mes: i for i, mes in enumerate(meses)}
+        
+        # Valores y bandas alineados con la lista de objetivos
+        valores = np.array([
+            valores_kpis[objetivo.kpi.code][indice_mes[objetivo.period.replace(day=1)]]
+            if objetivo.kpi.code in valores_kpis else np.nan
+            for objetivo in objetivos
+        ])
+        metas = np.array([objetivo.target_value for objetivo in objetivos], dtype=float)
+        minimos = np.array([objetivo.min_value for objetivo in objetivos], dtype=float)
+        maximos = np.array([objetivo.max_value for objetivo in objetivos], dtype=float)
+        
+        # Las comparaciones con NaN (sin banda o KPI no registrado) son falsas
+        estados = np.select(
+            [np.isnan(valores), valores < minimos, valores > maximos, valores >= metas],
+            ['sin_calculo', 'por_debajo', 'por_encima', 'cumplido'],
+            default='en_riesgo'
+        )
+        cumplimiento = dividir(valores, metas) * 100
+        
+        return [
+            {
+                'id': objetivo.id,
+                'kpi': objetivo.kpi.code,
+                'kpi_name': objetivo.kpi.get_code_display(),
+                'period': objetivo.period.isoformat(),
+                'valor': None if np.isnan(valor) else round(float(valor), 2),
+                'target_value': objetivo.target_value,
+                'min_value': objetivo.min_value,
+                'max_value': objetivo.max_value,
+                'cumplimiento': None if np.isnan(valor) else round(float(porcentaje), 2),
+                'estado': str(estado),
+            }
+            for objetivo, valor, porcentaje, estado in zip(objetivos, valores, cumplimiento, estados)
+        ]
+
+
+class KPIDesglose:
+    """
+    KPIs de horas (UBH, UB y horas facturadas vs. totales) desglosados por una dimensión
+    de RegistroHoras, con un solo GROUP BY para todos los grupos
+    """
+
+    # Parámetro de la API -> campo de RegistroHoras
+    DIMENSIONES = {
+        'planta': 'planta',
+        'ot': 'ot',
+        'grupo': 'employee_group',
+        'manager': 'manager',
+    }
+
+    # KPIs del registro que solo dependen de horas
+    KPIS_HORAS = ('UBH', 'UB')
+
+    @staticmethod
+    def calcular(fecha_inicio: date, fecha_fin: date, dimension: str) -> Dict[str, Any]:
+        """
+        Totales de horas y KPIs de horas de cada valor de la dimensión en el período.
+        Las horas facturables de un grupo son sus empleados distintos × días hábiles × 8.5;
+        al desglosar por planta los días hábiles descuentan los feriados de cada planta.
+        """
+        from apps.proyectos.models import FILTRO_FACTURADAS, RegistroHoras, ValorDimension
+
+        if dimension not in KPIDesglose.DIMENSIONES:
+            raise ValueError(f"Dimensión '{dimension}' no válida. Opciones: {list(KPIDesglose.DIMENSIONES)}")
+        campo = KPIDesglose.DIMENSIONES[dimension]
+
+        # Se agrupa por el id de ValorDimension y el texto se obtiene de la caché
+        grupos = list(
+            RegistroHoras.objects.filter(
+                date__gte=fecha_inicio,
+                date__lte=fecha_fin,
+            ).values(campo).annotate(
+                total_horas=Sum('hours_worked'),
+                # Mismo criterio que ResumenDiarioHoras.horas_facturadas
+                horas_facturadas=Sum('hours_worked', filter=FILTRO_FACTURADAS),
+                registros=Count('id'),
+                empleados=Count('employee', distinct=True),
+            ).order_by()
+        )
+        etiquetas = ValorDimension.valores(fila[campo] for fila in grupos)
+        grupos.sort(key=lambda fila: (-(fila['total_horas'] or 0), etiquetas[fila[campo]]))
+
+        valores = [etiquetas[fila[campo]] for fila in grupos]
+        total_horas = np.array([fila['total_horas'] or 0 for fila in grupos], dtype=float)
+        horas_facturadas = np.array([fila['horas_facturadas'] or 0 for fila in grupos], dtype=float)
+        empleados = np.array([fila['empleados'] for fila in grupos], dtype='int64')
+
+        if dimension == 'planta':
+            # Los feriados del período de todas las plantas en una consulta, en lugar de un calendario por planta
+            from apps.dashboard.models import DiaFeriado
+            
+            feriados = {}
+            for fecha, planta in DiaFeriado.objects.filter(
+                fecha__gte=fecha_inicio, fecha__lte=fecha_fin
+            ).values_list('fecha', 'planta'):
+                feriados.setdefault(planta, []).append(fecha)
+            dias_habiles = np.array([
+                np.busday_count(
+                    fecha_inicio, fecha_fin + timedelta(days=1), weekmask='1111100',
+                    holidays=np.array(feriados.get('', []) + feriados.get(planta, []), dtype='datetime64[D]')
+                )
+                for planta in valores
+            ], dtype='int64')
+        else:
+            dias_habiles = np.full(len(grupos), KPIDataCollector.calcular_dias_habiles(fecha_inicio, fecha_fin))
+        horas_facturables = empleados * dias_habiles * 8.5
+
+        campos = SimpleNamespace(
+            total_horas_planta=total_horas,
+            total_horas_facturadas=horas_facturadas,
+            total_horas_facturables=horas_facturables,
+        )
+        kpis = {
+            codigo: np.broadcast_to(REGISTRO_KPIS[codigo].formula(campos), (len(grupos),)).tolist()
+            for codigo in KPIDesglose.KPIS_HORAS
+        }
+        porcentaje_facturado = np.broadcast_to(dividir(horas_facturadas, total_horas) * 100, (len(grupos),)).tolist()
+
+        return {
+            'dimension': dimension,
+            'periodo': {
+                'fecha_inicio': fecha_inicio.isoformat(),
+                'fecha_fin': fecha_fin.isoformat(),
+            },
+            'grupos': [
+                {
+                    'valor': valor,
+                    'total_horas': float(total_horas[i]),
+                    'horas_facturadas': float(horas_facturadas[i]),
+                    'horas_no_facturadas': float(total_horas[i] - horas_facturadas[i]),
+                    'horas_facturables': float(horas_facturables[i]),
+                    'porcentaje_facturado': round(porcentaje_facturado[i], 2),
+                    'empleados': int(empleados[i]),
+                    'registros': fila['registros'],
+                    'dias_habiles': int(dias_habiles[i]),
+                    'kpis': {codigo: round(kpis[codigo][i], 2) for codigo in kpis},
+                }
+                for i, (valor, fila) in enumerate(zip(valores, grupos))
+            ],
+            'totales': {
+                'total_horas': float(total_horas.sum()),
+                'horas_facturadas': float(horas_facturadas.sum()),
+                'registros': sum(fila['registros'] for fila in grupos),
+            },
+        }
+
+
+class KPIEscenarios:
+    """
+    Análisis de sensibilidad: los KPIs de un período evaluados sobre una cuadrícula de
+    supuestos (costo por hora y factores de empleados facturables, horas e ingresos)
+    con broadcasting de NumPy, a partir de una sola recopilación de datos
+    """
+    
+    # Límite de combinaciones por solicitud
+    MAXIMO_ESCENARIOS = 10000
+    
+    @staticmethod
+    def evaluar(kpi_data: KPIData, costos_hora=None, factores_empleados=(1.0,),
+                factores_horas=(1.0,), factores_ingresos=(1.0,)) -> Dict[str, Any]:
+        """
+        Evalúa todos los KPIs registrados para cada combinación de los supuestos.
+        costos_hora reemplaza el costo por hora (por defecto, el calculado); los factores
+        multiplican los empleados facturables (y con ellos las horas facturables), las
+        horas registradas y los ingresos.
+        """
+        costos_hora = list(costos_hora or [kpi_data.costo_por_hora])
+        total = len(costos_hora) * len(factores_empleados) * len(factores_horas) * len(factores_ingresos)
+        if total > KPIEscenarios.MAXIMO_ESCENARIOS:
+            raise ValueError(
+                f"La cuadrícula tiene {total} escenarios; el máximo es {KPIEscenarios.MAXIMO_ESCENARIOS}"
+            )
+        
+        # Un eje por supuesto: (costo, empleados, horas, ingresos)
+        costo = np.asarray(costos_hora, dtype=float).reshape(-1, 1, 1, 1)
+        empleados = np.asarray(factores_empleados, dtype=float).reshape(1, -1, 1, 1)
+        horas = np.asarray(factores_horas, dtype=float).reshape(1, 1, -1, 1)
+        ingresos = np.asarray(factores_ingresos, dtype=float).reshape(1, 1, 1, -1)
+        
+        campos = SimpleNamespace(**asdict(kpi_data))
+        campos.costo_por_hora = costo
+        campos.numero_empleados_facturables = kpi_data.numero_empleados_facturables * empleados
+        campos.total_horas_facturables = kpi_data.total_horas_facturables * empleados
+        campos.total_horas_facturadas = kpi_data.total_horas_facturadas * horas
+        campos.total_horas_planta = kpi_data.total_horas_planta * horas
+        campos.ganancia_total = kpi_data.ganancia_total * ingresos
+        campos.ingresos_directos = kpi_data.ingresos_directos * ingresos
+        campos.ingresos_indirectos = kpi_data.ingresos_indirectos * ingresos
+        
+        forma = (costo.size, empleados.size, horas.size, ingresos.size)
+        valores = {
+            codigo: np.round(np.broadcast_to(definicion.formula(campos), forma), 2).ravel().tolist()
+            for codigo, definicion in REGISTRO_KPIS.items()
+        }
+        ejes = [eje.ravel().tolist() for eje in np.meshgrid(
+            costo.ravel(), empleados.ravel(), horas.ravel(), ingresos.ravel(), indexing='ij'
+        )]
+        
+        return {
+            'total_escenarios': total,
+            'escenarios': [
+                {
+                    'costo_hora': ejes[0][i],
+                    'factor_empleados': ejes[1][i],
+                    'factor_horas': ejes[2][i],
+                    'factor_ingresos': ejes[3][i],
+                    'kpis': {codigo: valores[codigo][i] for codigo in valores},
+                }
+                for i in range(total)
+            ],
+        }
+
+
+class KPICache:
+    """
+    Caché de resultados de KPIs. La llave incluye los parámetros del cálculo y la versión
+    de cada tabla de la que dependen (VersionDatos), así que nunca regresa resultados
+    calculados con datos que ya cambiaron.
+    """
+    
+    PREFIJO = 'kpis'
+    # Las versiones ya evitan resultados obsoletos; la expiración solo limpia llaves viejas
+    EXPIRACION = 31 * 24 * 60 * 60
+    LLAVE_ACIERTOS = 'kpis:estadisticas:aciertos'
+    LLAVE_FALLOS = 'kpis:estadisticas:fallos'
+    
+    @staticmethod
+    def versiones() -> Dict[str, int]:
+        """Versión actual de cada tabla de la que dependen los KPIs"""
+        from apps.dashboard.models import MODELOS_KPI, VersionDatos
+        
+        tablas = [modelo.lower() for modelo in MODELOS_KPI]
+        guardadas = dict(VersionDatos.objects.filter(tabla__in=tablas).values_list('tabla', 'version'))
+        return {tabla: guardadas.get(tabla, 0) for tabla in tablas}
+    
+    @staticmethod
+    def contar(llave: str):
+        """
+        Incrementa un contador de estadísticas en el caché compartido (CACHES de settings).
+        Con el caché en archivos el incremento no es atómico entre procesos, así que los
+        conteos son aproximados cuando hay muchas consultas simultáneas.
+        """
+        from django.core.cache import cache
+        
+        try:
+            cache.incr(llave)
+        except ValueError:
+            cache.set(llave, 1, timeout=None)
+    
+    @staticmethod
+    def obtener_o_calcular(nombre: str, parametros: tuple, calcular):
+        """Regresa el resultado guardado para nombre y parametros o lo calcula con calcular() y lo guarda"""
+        from django.core.cache import cache
+        
+        versiones = KPICache.versiones()
+        # Los parámetros pueden ser listas largas: se resumen en un hash para que la llave sea válida en cualquier backend
+        resumen = hashlib.sha1(repr(parametros).encode()).hexdigest()
+        llave = ':'.join([KPICache.PREFIJO, nombre, resumen, *map(str, versiones.values())])
+        
+        resultado = cache.get(llave)
+        if resultado is not None:
+            KPICache.contar(KPICache.LLAVE_ACIERTOS)
+            return resultado
+        
+        KPICache.contar(KPICache.LLAVE_FALLOS)
+        resultado = calcular()
+        cache.set(llave, resultado, timeout=KPICache.EXPIRACION)
+        return resultado
+    
+    @staticmethod
+    def estadisticas() -> Dict[str, Any]:
+        """Aciertos, fallos y versiones de datos actuales del caché de KPIs"""
+        from django.core.cache import cache
+        
+        aciertos = cache.get(KPICache.LLAVE_ACIERTOS, 0)
+        fallos = cache.get(KPICache.LLAVE_FALLOS, 0)
+        total = aciertos + fallos
+        return {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total * 100, 2) if total else 0,
+            'versiones': KPICache.versiones(),
+        }
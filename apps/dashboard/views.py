@@ -3,10 +3,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from apps.dashboard.models import Kpi, KpiTarget
-from .serializers import KpiSerializer, KpiTargetSerializer
-from .utils import KPI_Calculator, KPIDataCollector
-from datetime import datetime
+from apps.dashboard.models import Kpi, KpiSnapshot, KpiTarget
+from .serializers import KpiSerializer, KpiSnapshotSerializer, KpiTargetSerializer
+from .utils import KPI_Calculator, KPIBatch, KPICache, KPICumplimiento, KPIDataCollector, KPIDesglose, KPIEscenarios, KPIHistorial
+from datetime import date, datetime, timedelta
 
 
 
@@ -103,10 +103,54 @@ def view_KPI_goal(request):
     """
     Vista para ver las metas de KPIs.
     """
-    kpi_goals = KpiTarget.objects.all()
+    kpi_goals = KpiTarget.objects.select_related('kpi')
     serializer = KpiTargetSerializer(kpi_goals, many=True)
     return Response({"KPI Goals": serializer.data})
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cumplimiento_KPI_goals(request):
+    """
+    Compara cada meta de KPI del rango con el valor real del KPI en el mes de la meta.
+    Parámetros de query opcionales:
+    - desde: YYYY-MM (por defecto: enero del año de hasta)
+    - hasta: YYYY-MM (por defecto: mes actual)
+    - kpis: códigos separados por coma, p. ej. ELDR,RE (por defecto: todos)
+    """
+    try:
+        hasta_str = request.GET.get('hasta')
+        desde_str = request.GET.get('desde')
+        
+        if hasta_str:
+            hasta = datetime.strptime(hasta_str, '%Y-%m').date()
+        else:
+            hasta = date.today().replace(day=1)
+        
+        if desde_str:
+            desde = datetime.strptime(desde_str, '%Y-%m').date()
+        else:
+            desde = hasta.replace(month=1)
+    except ValueError:
+        return Response({
+            'error': 'Los meses deben tener el formato YYYY-MM'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if desde > hasta:
+        return Response({
+            'error': 'El mes inicial no puede ser posterior al mes final'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    codigos = None
+    if request.GET.get('kpis'):
+        codigos = [codigo.strip().upper() for codigo in request.GET['kpis'].split(',') if codigo.strip()]
+    
+    resultados = KPICumplimiento.calcular(desde, KPIHistorial.fin_de_mes(hasta), codigos)
+    return Response({
+        'desde': desde.strftime('%Y-%m'),
+        'hasta': hasta.strftime('%Y-%m'),
+        'resultados': resultados,
+    })
+
 @api_view(['POST', 'PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def edit_KPI_goal(request, kpi_goal_id):
@@ -186,6 +230,8 @@ def calcular_kpi(request, kpi_name):
     - fecha_inicio: YYYY-MM-DD (por defecto: inicio del mes actual)
     - fecha_fin: YYYY-MM-DD (por defecto: fecha actual)
     - costo_hora: float (por defecto: calculado automáticamente)
+    A diferencia de calcular_todos_kpis, 'datos_utilizados' solo incluye los datos de los
+    que depende el KPI, porque los demás no se consultan.
     """
     try:
         # Obtener parámetros de fecha
@@ -197,7 +243,7 @@ def calcular_kpi(request, kpi_name):
         if fecha_fin_str:
             fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
         else:
-            fecha_fin = datetime.date.today()
+            fecha_fin = date.today()
         
         if fecha_inicio_str:
             fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
@@ -211,21 +257,27 @@ def calcular_kpi(request, kpi_name):
                 'error': 'La fecha de inicio no puede ser posterior a la fecha de fin'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Recopilar datos
         costo_hora = float(costo_hora_custom) if costo_hora_custom else 250.0
-        kpi_data = KPIDataCollector.collect_kpi_data(fecha_inicio, fecha_fin, costo_hora)
-        
-        # Calcular KPI específico
-        calculator = KPI_Calculator()
-        resultado = calculator.calculate_KPI(kpi_name, kpi_data)
         
-        # Agregar información del período
-        resultado['periodo'] = {
-            'fecha_inicio': fecha_inicio.isoformat(),
-            'fecha_fin': fecha_fin.isoformat(),
-            'dias_totales': (fecha_fin - fecha_inicio).days + 1
-        }
+        def calcular():
+            # Los datos se consultan solo para los campos que usa el KPI
+            kpi_data = KPIDataCollector.datos_perezosos(fecha_inicio, fecha_fin, costo_hora)
+            
+            # Calcular KPI específico
+            calculator = KPI_Calculator()
+            resultado = calculator.calculate_KPI(kpi_name, kpi_data)
+            
+            # Agregar información del período
+            resultado['periodo'] = {
+                'fecha_inicio': fecha_inicio.isoformat(),
+                'fecha_fin': fecha_fin.isoformat(),
+                'dias_totales': (fecha_fin - fecha_inicio).days + 1
+            }
+            return resultado
         
+        resultado = KPICache.obtener_o_calcular(
+            'kpi', (kpi_name.upper(), fecha_inicio, fecha_fin, costo_hora), calcular
+        )
         return Response(resultado)
         
     except ValueError as e:
@@ -253,7 +305,7 @@ def calcular_todos_kpis(request):
         if fecha_fin_str:
             fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
         else:
-            fecha_fin = datetime.date.today()
+            fecha_fin = date.today()
         
         if fecha_inicio_str:
             fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
@@ -265,37 +317,280 @@ def calcular_todos_kpis(request):
                 'error': 'La fecha de inicio no puede ser posterior a la fecha de fin'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Recopilar datos
         costo_hora = float(costo_hora_custom) if costo_hora_custom else 250.0
-        kpi_data = KPIDataCollector.collect_kpi_data(fecha_inicio, fecha_fin, costo_hora)
         
-        # Calcular todos los KPIs
-        calculator = KPI_Calculator()
-        resultados = calculator.calculate_all_KPIs(kpi_data)
+        def calcular():
+            # Recopilar datos
+            kpi_data = KPIDataCollector.collect_kpi_data(fecha_inicio, fecha_fin, costo_hora)
+            
+            # Calcular todos los KPIs
+            calculator = KPI_Calculator()
+            resultados = calculator.calculate_all_KPIs(kpi_data)
+            
+            # Agregar información del período a la respuesta
+            return {
+                'periodo': {
+                    'fecha_inicio': fecha_inicio.isoformat(),
+                    'fecha_fin': fecha_fin.isoformat(),
+                    'dias_totales': (fecha_fin - fecha_inicio).days + 1
+                },
+                'resumen_datos': {
+                    'empleados_total': kpi_data.numero_empleados,
+                    'empleados_facturables': kpi_data.numero_empleados_facturables,
+                    'horas_planta_total': kpi_data.total_horas_planta,
+                    'horas_facturables': kpi_data.total_horas_facturables,
+                    'horas_facturadas': kpi_data.total_horas_facturadas,
+                    'ganancia_total': kpi_data.ganancia_total,
+                    'ingresos_directos': kpi_data.ingresos_directos,
+                    'ingresos_indirectos': kpi_data.ingresos_indirectos
+                },
+                'kpis': resultados
+            }
+        
+        response_data = KPICache.obtener_o_calcular(
+            'todos', (fecha_inicio, fecha_fin, costo_hora), calcular
+        )
+        return Response(response_data)
         
-        # Agregar información del período a la respuesta
-        response_data = {
-            'periodo': {
+    except Exception as e:
+        return Response({
+            'error': f'Error interno: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def calcular_kpis_por_periodo(request):
+    """
+    Calcula todos los KPIs para cada mes, trimestre o año fiscal de un rango en una sola llamada
+    Parámetros de query opcionales:
+    - fecha_inicio: YYYY-MM-DD (por defecto: inicio del mes, 11 meses antes de fecha_fin)
+    - fecha_fin: YYYY-MM-DD (por defecto: fecha actual)
+    - agrupacion: mensual, trimestral o anual (por defecto: mensual)
+    - mes_inicio_fiscal: 1-12, mes en que empieza el año fiscal (por defecto: 1)
+    - costo_hora: float (por defecto: calculado automáticamente)
+    """
+    try:
+        fecha_fin_str = request.GET.get('fecha_fin')
+        fecha_inicio_str = request.GET.get('fecha_inicio')
+        costo_hora_custom = request.GET.get('costo_hora')
+        agrupacion = request.GET.get('agrupacion', 'mensual')
+        mes_inicio_fiscal = int(request.GET.get('mes_inicio_fiscal', 1))
+        
+        if fecha_fin_str:
+            fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
+        else:
+            fecha_fin = date.today()
+        
+        if fecha_inicio_str:
+            fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
+        else:
+            fecha_inicio = fecha_fin.replace(day=1)
+            for _ in range(11):
+                fecha_inicio = (fecha_inicio - timedelta(days=1)).replace(day=1)
+        
+        if fecha_inicio > fecha_fin:
+            return Response({
+                'error': 'La fecha de inicio no puede ser posterior a la fecha de fin'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        costo_hora = float(costo_hora_custom) if costo_hora_custom else 250.0
+        resultado = KPICache.obtener_o_calcular(
+            'periodos',
+            (fecha_inicio, fecha_fin, agrupacion, mes_inicio_fiscal, costo_hora),
+            lambda: KPIBatch.calcular(fecha_inicio, fecha_fin, agrupacion, mes_inicio_fiscal, costo_hora)
+        )
+        resultado['agrupacion'] = agrupacion
+        
+        return Response(resultado)
+        
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({
+            'error': f'Error interno: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def calcular_escenarios_kpis(request):
+    """
+    Evalúa todos los KPIs de un período sobre una cuadrícula de supuestos, recopilando los datos una sola vez
+    Parámetros de query opcionales (listas separadas por coma):
+    - fecha_inicio: YYYY-MM-DD (por defecto: inicio del mes actual)
+    - fecha_fin: YYYY-MM-DD (por defecto: fecha actual)
+    - costo_hora: p. ej. 200,250,300 (por defecto: el calculado)
+    - factor_empleados: multiplicadores de empleados facturables, p. ej. 0.9,1,1.1
+    - factor_horas: multiplicadores de horas registradas
+    - factor_ingresos: multiplicadores de ingresos
+    """
+    def lista(nombre, defecto=None):
+        valor = request.GET.get(nombre)
+        if not valor:
+            return defecto
+        return tuple(float(x) for x in valor.split(',') if x.strip())
+    
+    try:
+        fecha_fin_str = request.GET.get('fecha_fin')
+        fecha_inicio_str = request.GET.get('fecha_inicio')
+        
+        if fecha_fin_str:
+            fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
+        else:
+            fecha_fin = date.today()
+        
+        if fecha_inicio_str:
+            fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
+        else:
+            fecha_inicio = fecha_fin.replace(day=1)
+        
+        if fecha_inicio > fecha_fin:
+            return Response({
+                'error': 'La fecha de inicio no puede ser posterior a la fecha de fin'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        supuestos = {
+            'costos_hora': lista('costo_hora'),
+            'factores_empleados': lista('factor_empleados', (1.0,)),
+            'factores_horas': lista('factor_horas', (1.0,)),
+            'factores_ingresos': lista('factor_ingresos', (1.0,)),
+        }
+        
+        def calcular():
+            kpi_data = KPIDataCollector.collect_kpi_data(fecha_inicio, fecha_fin)
+            resultado = KPIEscenarios.evaluar(kpi_data, **supuestos)
+            resultado['periodo'] = {
                 'fecha_inicio': fecha_inicio.isoformat(),
                 'fecha_fin': fecha_fin.isoformat(),
                 'dias_totales': (fecha_fin - fecha_inicio).days + 1
-            },
-            'resumen_datos': {
-                'empleados_total': kpi_data.numero_empleados,
-                'empleados_facturables': kpi_data.numero_empleados_facturables,
-                'horas_planta_total': kpi_data.total_horas_planta,
-                'horas_facturables': kpi_data.total_horas_facturables,
-                'horas_facturadas': kpi_data.total_horas_facturadas,
-                'ganancia_total': kpi_data.ganancia_total,
-                'ingresos_directos': kpi_data.ingresos_directos,
-                'ingresos_indirectos': kpi_data.ingresos_indirectos
-            },
-            'kpis': resultados
-        }
+            }
+            # Valores sin supuestos, para comparar
+            resultado['base'] = {
+                codigo: calculo['valor'] for codigo, calculo in KPI_Calculator().calculate_all_KPIs(kpi_data).items()
+            }
+            return resultado
         
-        return Response(response_data)
+        resultado = KPICache.obtener_o_calcular(
+            'escenarios', (fecha_inicio, fecha_fin, *supuestos.values()), calcular
+        )
+        return Response(resultado)
         
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({
+            'error': f'Error interno: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def desglose_kpis_horas(request):
+    """
+    KPIs de horas (UBH, UB, horas facturadas vs. totales) de cada planta, OT, grupo o manager
+    en una sola llamada
+    Parámetros de query:
+    - dimension: planta, ot, grupo o manager (por defecto: planta)
+    - fecha_inicio: YYYY-MM-DD (por defecto: inicio del mes actual)
+    - fecha_fin: YYYY-MM-DD (por defecto: fecha actual)
+    """
+    try:
+        fecha_fin_str = request.GET.get('fecha_fin')
+        fecha_inicio_str = request.GET.get('fecha_inicio')
+        dimension = request.GET.get('dimension', 'planta')
+
+        if fecha_fin_str:
+            fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
+        else:
+            fecha_fin = date.today()
+
+        if fecha_inicio_str:
+            fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
+        else:
+            fecha_inicio = fecha_fin.replace(day=1)
+
+        if fecha_inicio > fecha_fin:
+            return Response({
+                'error': 'La fecha de inicio no puede ser posterior a la fecha de fin'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado = KPICache.obtener_o_calcular(
+            'desglose',
+            (fecha_inicio, fecha_fin, dimension),
+            lambda: KPIDesglose.calcular(fecha_inicio, fecha_fin, dimension)
+        )
+        return Response(resultado)
+
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'error': f'Error interno: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def historial_kpis(request):
+    """
+    Series históricas de KPIs leídas de los snapshots de meses cerrados. Los snapshots
+    cuyos datos cambiaron desde que se guardaron se recalculan antes de responder.
+    Parámetros de query opcionales:
+    - desde: YYYY-MM (por defecto: 24 meses antes de hasta)
+    - hasta: YYYY-MM (por defecto: último mes cerrado)
+    - kpis: códigos separados por coma, p. ej. ELDR,RE (por defecto: todos)
+    """
+    try:
+        desde_str = request.GET.get('desde')
+        hasta_str = request.GET.get('hasta')
+        
+        if hasta_str:
+            hasta = datetime.strptime(hasta_str, '%Y-%m').date()
+        else:
+            hasta = KPIHistorial.ultimo_mes_cerrado()
+        
+        if desde_str:
+            desde = datetime.strptime(desde_str, '%Y-%m').date()
+        else:
+            desde = hasta.replace(year=hasta.year - 2)
+    except ValueError:
+        return Response({
+            'error': 'Los meses deben tener el formato YYYY-MM'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if desde > hasta:
+        return Response({
+            'error': 'El mes inicial no puede ser posterior al mes final'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    KPIHistorial.refrescar_obsoletos(desde, hasta)
+    snapshots = list(KpiSnapshot.objects.filter(periodo__gte=desde, periodo__lte=hasta))
+    
+    codigos = [codigo for codigo, _ in Kpi.KPI_CHOICES]
+    if request.GET.get('kpis'):
+        codigos = [codigo.strip().upper() for codigo in request.GET['kpis'].split(',') if codigo.strip()]
+    
+    return Response({
+        'desde': desde.strftime('%Y-%m'),
+        'hasta': hasta.strftime('%Y-%m'),
+        'periodos': [snapshot.periodo.strftime('%Y-%m') for snapshot in snapshots],
+        'series': {
+            codigo: [snapshot.valores.get(codigo) for snapshot in snapshots]
+            for codigo in codigos
+        },
+        'datos': KpiSnapshotSerializer(snapshots, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estadisticas_cache_kpis(request):
+    """
+    Aciertos y fallos del caché de KPIs y versión actual de los datos de los que dependen.
+    Los conteos son de todos los procesos del servidor (caché compartido en CACHES).
+    """
+    return Response(KPICache.estadisticas())
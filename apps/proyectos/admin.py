@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Proyecto, AsignacionProyecto, RegistroHoras
+from .models import Proyecto, AsignacionProyecto, RegistroHoras, TrabajoCarga, ArchivoCarga, IdentidadEmpleado, ValorDimension
 
 
 
@@ -8,4 +8,13 @@ admin.site.register(AsignacionProyecto)
 admin.site.site_header = "KEP Proyectos Admin"
 admin.site.site_title = "KEP Proyectos Admin"
 admin.site.index_title = "Administración de Proyectos KEP"
-admin.site.register(RegistroHoras)  # Asegúrate de importar RegistroHoras si lo necesitas
\ No newline at end of file
+
+@admin.register(RegistroHoras)
+class RegistroHorasAdmin(admin.ModelAdmin):
+    # El listado muestra la OT de cada registro: se trae en la misma consulta
+    list_select_related = ('ot',)
+
+admin.site.register(TrabajoCarga)
+admin.site.register(ArchivoCarga)
+admin.site.register(IdentidadEmpleado)
+admin.site.register(ValorDimension)
@@ -0,0 +1,222 @@
+import os
+import socket
+import time
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from apps.dashboard.utils import KPIHistorial
+
+from .models import ArchivoCarga, TrabajoCarga
+from .utils import LoadData, MantenimientoBD
+
+_executor = None
+_executor_lock = threading.Lock()
+# Trabajos enviados al pool de este proceso que aún no terminan
+_trabajos_en_curso = set()
+
+# Segundos sin avance tras los cuales un trabajo cuyo proceso ya no existe se da por perdido
+TRABAJO_INACTIVO = 10 * 60
+
+
+def get_executor():
+    """Pool de hilos compartido por el proceso; se crea al encolar la primera carga"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CARGA_HORAS_WORKERS', 1),
+                thread_name_prefix='carga_horas'
+            )
+    return _executor
+
+
+def encolar_carga(file, usuario=None, forzar=False):
+    """
+    Guarda el archivo subido en disco, registra el trabajo y lo envía al pool.
+    Si un archivo con el mismo contenido ya se cargó (o se está cargando) no se
+    vuelve a procesar, salvo con forzar (p. ej. tras depurar los datos que cargó).
+    Retorna (trabajo, duplicado) sin esperar a que se procese.
+    """
+    inicio = time.monotonic()
+    ruta, sha256 = LoadData.guardar_en_disco(file)
+
+    # Un trabajo perdido en un reinicio impediría volver a subir su archivo
+    recuperar_trabajos_abandonados()
+
+    duplicado = None
+    try:
+        # La revisión y el registro van en una transacción; si otra subida del mismo archivo
+        # gana la carrera, la restricción única de sha256 lo detecta
+        with transaction.atomic():
+            previo = ArchivoCarga.objects.select_for_update().filter(sha256=sha256).select_related('trabajo').first()
+            if previo and previo.trabajo.estado != 'error' and not forzar:
+                duplicado = previo.trabajo
+            else:
+                trabajo = TrabajoCarga.objects.create(
+                    archivo=file.name,
+                    ruta=ruta,
+                    usuario=usuario if usuario and usuario.is_authenticated else None,
+                    host=socket.gethostname(),
+                    pid=os.getpid(),
+                    tiempos={'guardado': round(time.monotonic() - inicio, 3)}
+                )
+                archivo = previo or ArchivoCarga(sha256=sha256)
+                archivo.archivo = file.name
+                archivo.tamano = file.size or 0
+                archivo.trabajo = trabajo
+                archivo.fecha_min = archivo.fecha_max = None
+                archivo.save()
+    except IntegrityError:
+        duplicado = ArchivoCarga.objects.select_related('trabajo').get(sha256=sha256).trabajo
+
+    if duplicado:
+        os.remove(ruta)
+        return duplicado, True
+
+    with _executor_lock:
+        _trabajos_en_curso.add(trabajo.id)
+    get_executor().submit(procesar_trabajo, trabajo.id)
+    return trabajo, False
+
+
+def trabajo_en_ejecucion(trabajo):
+    """Indica si el proceso al que se envió el trabajo sigue vivo y lo tiene en su pool"""
+    if not trabajo.pid:
+        # Encolado antes de registrar el proceso: ese proceso ya no está
+        return False
+    if trabajo.host == socket.gethostname() and trabajo.pid == os.getpid():
+        return trabajo.id in _trabajos_en_curso
+    return LoadData.proceso_vivo(trabajo.host, trabajo.pid)
+
+
+def recuperar_trabajos_abandonados(trabajos=None):
+    """
+    Marca como error los trabajos pendientes o en proceso que llevan TRABAJO_INACTIVO segundos
+    sin avance y cuyo proceso ya no los está ejecutando (p. ej. se reinició el servidor), y
+    elimina su archivo temporal. Así el archivo se puede volver a subir.
+    trabajos limita la revisión a una consulta de TrabajoCarga. Retorna los trabajos marcados.
+    """
+    if trabajos is None:
+        trabajos = TrabajoCarga.objects.all()
+    abandonados = [
+        trabajo for trabajo in trabajos.filter(
+            estado__in=['pendiente', 'procesando'],
+            actualizado_en__lt=timezone.now() - timedelta(seconds=TRABAJO_INACTIVO)
+        )
+        if not trabajo_en_ejecucion(trabajo)
+    ]
+
+    for trabajo in abandonados:
+        trabajo.estado = 'error'
+        trabajo.etapa = 'finalizado'
+        trabajo.mensaje_error = "La carga se interrumpió: el proceso que la ejecutaba terminó antes de completarla"
+        trabajo.finalizado_en = timezone.now()
+        trabajo.save(update_fields=['estado', 'etapa', 'mensaje_error', 'finalizado_en', 'actualizado_en'])
+        if trabajo.ruta and os.path.exists(trabajo.ruta):
+            os.remove(trabajo.ruta)
+    return abandonados
+
+
+def procesar_trabajo(trabajo_id):
+    """Ejecuta la carga de un TrabajoCarga y va registrando su progreso"""
+    trabajo = TrabajoCarga.objects.get(id=trabajo_id)
+    trabajo.estado = 'procesando'
+    trabajo.iniciado_en = timezone.now()
+    trabajo.tiempos['espera'] = round((trabajo.iniciado_en - trabajo.creado_en).total_seconds(), 3)
+    trabajo.save(update_fields=['estado', 'iniciado_en', 'tiempos', 'actualizado_en'])
+
+    def progreso(etapa, resumen):
+        TrabajoCarga.objects.filter(id=trabajo_id).update(
+            actualizado_en=timezone.now(),
+            etapa=etapa,
+            filas_procesadas=resumen['filas'],
+            creados=resumen['creados'],
+            actualizados=resumen['actualizados'],
+            sin_cambios=resumen['sin_cambios'],
+            duplicados=resumen['duplicados'],
+            errores=resumen['errores'],
+        )
+
+    inicio = time.monotonic()
+    try:
+        # La codificación se detecta una sola vez por carga y queda guardada en el trabajo
+        if not trabajo.codificacion and LoadData.extension(trabajo.ruta) in ('.csv', '.csv.gz'):
+            trabajo.codificacion = LoadData.detectar_codificacion(trabajo.ruta)
+            trabajo.save(update_fields=['codificacion'])
+
+        resumen = LoadData.cargar_archivo(trabajo.ruta, progreso=progreso, encoding=trabajo.codificacion or None)
+
+        trabajo.estado = 'completado'
+        trabajo.filas_procesadas = resumen['filas']
+        trabajo.creados = resumen['creados']
+        trabajo.actualizados = resumen['actualizados']
+        trabajo.sin_cambios = resumen['sin_cambios']
+        trabajo.duplicados = resumen['duplicados']
+        trabajo.errores = resumen['errores']
+        trabajo.tiempos.update({
+            etapa: round(segundos, 3) for etapa, segundos in resumen['tiempos'].items()
+        })
+        trabajo.detalle_archivos = {
+            nombre: {
+                **detalle,
+                'fecha_min': detalle['fecha_min'].isoformat() if detalle['fecha_min'] else None,
+                'fecha_max': detalle['fecha_max'].isoformat() if detalle['fecha_max'] else None,
+                'tiempos': {etapa: round(segundos, 3) for etapa, segundos in detalle['tiempos'].items()},
+            }
+            for nombre, detalle in resumen.get('archivos', {}).items()
+        }
+        ArchivoCarga.objects.filter(trabajo=trabajo).update(
+            fecha_min=resumen['fecha_min'],
+            fecha_max=resumen['fecha_max']
+        )
+        actualizar_historial_kpis(resumen)
+        mantenimiento_tras_carga(resumen)
+    except Exception as e:
+        trabajo.estado = 'error'
+        trabajo.mensaje_error = str(e)
+    finally:
+        trabajo.etapa = 'finalizado'
+        trabajo.finalizado_en = timezone.now()
+        trabajo.tiempos['procesamiento'] = round(time.monotonic() - inicio, 3)
+        trabajo.save()
+
+        if os.path.exists(trabajo.ruta):
+            os.remove(trabajo.ruta)
+        with _executor_lock:
+            _trabajos_en_curso.discard(trabajo_id)
+        # Cada hilo del pool abre su propia conexión; cerrarla al terminar el trabajo
+        connection.close()
+
+
+def actualizar_historial_kpis(resumen):
+    """
+    Recalcula el histórico de KPIs de los meses cerrados que tocó la carga.
+    Un error aquí no invalida la carga; el histórico se puede regenerar con
+    el comando generar_historial_kpis.
+    """
+    if not resumen['fecha_min'] or (resumen['creados'] == 0 and resumen['actualizados'] == 0):
+        return
+    try:
+        KPIHistorial.actualizar_historial(resumen['fecha_min'], resumen['fecha_max'])
+    except Exception as e:
+        print(f"Error al actualizar el histórico de KPIs: {e}")
+
+
+def mantenimiento_tras_carga(resumen):
+    """
+    Tras una carga que escribió al menos SQLITE_MANTENIMIENTO_FILAS filas, actualiza las
+    estadísticas del planificador y devuelve las páginas libres de la staging. Un error aquí
+    no invalida la carga; se puede repetir con el comando mantenimiento_sqlite.
+    """
+    minimo = getattr(settings, 'SQLITE_MANTENIMIENTO_FILAS', 0)
+    if not minimo or connection.vendor != 'sqlite' or resumen['creados'] + resumen['actualizados'] < minimo:
+        return
+    try:
+        MantenimientoBD.ejecutar()
+    except Exception as e:
+        print(f"Error en el mantenimiento de la base de datos: {e}")
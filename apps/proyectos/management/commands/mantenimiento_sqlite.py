@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.proyectos.utils import MantenimientoBD
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza las estadísticas del planificador de SQLite (ANALYZE / PRAGMA optimize), "
+        "ejecuta un vacuum incremental y trunca el WAL; útil después de cargas grandes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analisis-completo', action='store_true',
+            help="ANALYZE lee todas las filas de cada índice en lugar de una muestra"
+        )
+        parser.add_argument(
+            '--vacuum-completo', action='store_true',
+            help="Cambia la base a auto_vacuum incremental con un VACUUM (reescribe el archivo y la bloquea mientras dura)"
+        )
+        parser.add_argument(
+            '--paginas', type=int,
+            help="Páginas libres a devolver en el vacuum incremental (por defecto: SQLITE_VACUUM_PAGINAS; 0 = todas)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            resultado = MantenimientoBD.ejecutar(
+                analisis_completo=options['analisis_completo'],
+                vacuum_completo=options['vacuum_completo'],
+                paginas=options['paginas'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for nombre, valor in MantenimientoBD.pragmas().items():
+            self.stdout.write(f"PRAGMA {nombre} = {valor}")
+        if not resultado['vacuum_incremental']:
+            self.stdout.write(self.style.WARNING(
+                "La base no usa auto_vacuum incremental; ejecute una vez con --vacuum-completo para activarlo"
+            ))
+
+        antes, despues = resultado['antes'], resultado['despues']
+        tiempos = ', '.join(f"{etapa} {segundos:.2f} s" for etapa, segundos in resultado['tiempos'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Mantenimiento terminado ({tiempos}). Tamaño: {antes['bytes'] / 2**20:.1f} MB -> "
+            f"{despues['bytes'] / 2**20:.1f} MB; libres: {antes['libres'] / 2**20:.1f} MB -> "
+            f"{despues['libres'] / 2**20:.1f} MB"
+        ))
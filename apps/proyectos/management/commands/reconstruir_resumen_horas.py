@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dashboard.models import datos_modificados
+from apps.proyectos.models import RegistroHoras, ResumenDiarioHoras
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen diario de horas (ResumenDiarioHoras) a partir de RegistroHoras"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial YYYY-MM-DD (por defecto: todo el historial)")
+        parser.add_argument('--hasta', help="Fecha final YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else None
+        except ValueError:
+            raise CommandError("Las fechas deben tener el formato YYYY-MM-DD")
+
+        if desde is None and hasta is None:
+            dias = ResumenDiarioHoras.recalcular()
+        else:
+            # Fechas del rango que tienen registros o que ya tenían resumen (por si se borraron)
+            fechas = set()
+            for modelo in (RegistroHoras, ResumenDiarioHoras):
+                consulta = modelo.objects.all()
+                if desde:
+                    consulta = consulta.filter(date__gte=desde)
+                if hasta:
+                    consulta = consulta.filter(date__lte=hasta)
+                fechas.update(consulta.values_list('date', flat=True).order_by().distinct())
+            dias = ResumenDiarioHoras.recalcular(fechas)
+
+        # Los KPIs leen las horas del resumen: invalidar los resultados en caché calculados con el anterior
+        datos_modificados.send(sender=RegistroHoras)
+        self.stdout.write(self.style.SUCCESS(f"Resumen diario reconstruido: {dias} días con registros"))
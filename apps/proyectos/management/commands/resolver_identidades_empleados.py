@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.proyectos.models import IdentidadEmpleado, ValorDimension
+
+
+class Command(BaseCommand):
+    help = "Relaciona los nombres de empleado de RegistroHoras con Empleado (IdentidadEmpleado)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-nuevos', action='store_true',
+            help="No volver a buscar los nombres que ya quedaron sin resolver"
+        )
+
+    def handle(self, *args, **options):
+        nombres = ValorDimension.objects.filter(dimension='employee').values_list('valor', flat=True)
+        resultado = IdentidadEmpleado.resolver(nombres, reintentar=not options['solo_nuevos'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Identidades: {resultado['nuevos']} nuevas, {resultado['resueltos']} resueltas, "
+            f"{resultado['sin_resolver']} sin resolver"
+        ))
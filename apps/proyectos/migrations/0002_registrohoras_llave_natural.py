@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def eliminar_duplicados(apps, schema_editor):
+    """Conserva solo el registro más reciente de cada (date, employee, task) antes de crear la restricción"""
+    RegistroHoras = apps.get_model('proyectos', 'RegistroHoras')
+
+    duplicados = (
+        RegistroHoras.objects
+        .values('date', 'employee', 'task')
+        .annotate(ultimo_id=Max('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+
+    for dup in duplicados:
+        RegistroHoras.objects.filter(
+            date=dup['date'],
+            employee=dup['employee'],
+            task=dup['task'],
+        ).exclude(id=dup['ultimo_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='registrohoras',
+            constraint=models.UniqueConstraint(fields=('date', 'employee', 'task'), name='registrohoras_llave_natural'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0004_trabajocarga_codificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoCarga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('archivo', models.CharField(max_length=255)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('fecha_min', models.DateField(blank=True, null=True)),
+                ('fecha_max', models.DateField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('trabajo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='proyectos.trabajocarga')),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 10:52
+
+import pandas as pd
+from django.db import migrations, models
+
+CAMPOS_ACTUALIZABLES = [
+    'time_entry_status', 'hours_worked', 'employee_group',
+    'manager', 'project_status', 'ot', 'planta'
+]
+
+
+def calcular_row_hash(apps, schema_editor):
+    """Calcula el hash de los registros existentes, igual que LoadData.hash_filas"""
+    RegistroHoras = apps.get_model('proyectos', 'RegistroHoras')
+    tamano_lote = 5000
+
+    ids = list(RegistroHoras.objects.order_by('id').values_list('id', flat=True))
+    for inicio in range(0, len(ids), tamano_lote):
+        filas = pd.DataFrame.from_records(
+            RegistroHoras.objects.filter(id__in=ids[inicio:inicio + tamano_lote])
+            .values('id', *CAMPOS_ACTUALIZABLES)
+        )
+        campos = filas[CAMPOS_ACTUALIZABLES].astype({
+            'time_entry_status': str,
+            'hours_worked': 'int64',
+            'employee_group': str,
+            'manager': str,
+            'project_status': bool,
+            'ot': str,
+            'planta': str,
+        })
+        hashes = pd.util.hash_pandas_object(campos, index=False).to_numpy().view('int64')
+
+        RegistroHoras.objects.bulk_update(
+            [RegistroHoras(id=id_, row_hash=int(h)) for id_, h in zip(filas['id'], hashes)],
+            ['row_hash']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0005_archivocarga'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrohoras',
+            name='row_hash',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='trabajocarga',
+            name='sin_cambios',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calcular_row_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0006_registrohoras_row_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajocarga',
+            name='detalle_archivos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
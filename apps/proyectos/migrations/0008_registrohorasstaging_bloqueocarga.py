@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0007_trabajocarga_detalle_archivos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueoCarga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('propietario', models.CharField(max_length=32)),
+                ('adquirido_en', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RegistroHorasStaging',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carga', models.CharField(db_index=True, max_length=32)),
+                ('date', models.DateField()),
+                ('time_entry_status', models.CharField(max_length=100)),
+                ('task', models.CharField(max_length=200)),
+                ('hours_worked', models.IntegerField()),
+                ('employee', models.CharField(max_length=100)),
+                ('employee_group', models.CharField(max_length=100)),
+                ('manager', models.CharField(max_length=100)),
+                ('project_status', models.BooleanField()),
+                ('ot', models.CharField(max_length=100)),
+                ('planta', models.CharField(max_length=100)),
+                ('row_hash', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='trabajocarga',
+            name='etapa',
+            field=models.CharField(choices=[('en_cola', 'En Cola'), ('esperando', 'Esperando Otra Carga'), ('leyendo', 'Leyendo Archivo'), ('escribiendo', 'Escribiendo Registros'), ('fusionando', 'Aplicando Cambios'), ('finalizado', 'Finalizado')], default='en_cola', max_length=20),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 11:00
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def llenar_resumen(apps, schema_editor):
+    """Calcula el resumen diario de los registros de horas existentes"""
+    RegistroHoras = apps.get_model('proyectos', 'RegistroHoras')
+    ResumenDiarioHoras = apps.get_model('proyectos', 'ResumenDiarioHoras')
+
+    totales = RegistroHoras.objects.values('date').annotate(
+        total_horas=Sum('hours_worked'),
+        horas_facturadas=Sum(
+            'hours_worked',
+            filter=Q(project_status=True, ot__isnull=False) & ~Q(ot='')
+        ),
+        registros=Count('id'),
+        empleados=Count('employee', distinct=True),
+    ).order_by()
+
+    ResumenDiarioHoras.objects.bulk_create(
+        [
+            ResumenDiarioHoras(
+                date=fila['date'],
+                total_horas=fila['total_horas'] or 0,
+                horas_facturadas=fila['horas_facturadas'] or 0,
+                registros=fila['registros'],
+                empleados=fila['empleados'],
+            )
+            for fila in totales
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0008_registrohorasstaging_bloqueocarga'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioHoras',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('total_horas', models.BigIntegerField(default=0)),
+                ('horas_facturadas', models.BigIntegerField(default=0)),
+                ('registros', models.PositiveIntegerField(default=0)),
+                ('empleados', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0009_resumendiariohoras'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registrohoras',
+            index=models.Index(fields=['date', 'planta'], name='registrohoras_fecha_planta'),
+        ),
+        migrations.AddIndex(
+            model_name='registrohoras',
+            index=models.Index(fields=['date', 'ot'], name='registrohoras_fecha_ot'),
+        ),
+        migrations.AddIndex(
+            model_name='registrohoras',
+            index=models.Index(fields=['date', 'employee_group'], name='registrohoras_fecha_grupo'),
+        ),
+        migrations.AddIndex(
+            model_name='registrohoras',
+            index=models.Index(fields=['date', 'manager'], name='registrohoras_fecha_manager'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_auth', '0001_initial'),
+        ('proyectos', '0010_registrohoras_indices_dimensiones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentidadEmpleado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_registro', models.CharField(max_length=100, unique=True)),
+                ('nombre_normalizado', models.CharField(db_index=True, max_length=100)),
+                ('metodo', models.CharField(choices=[('exacto', 'Coincidencia Exacta'), ('similitud', 'Por Similitud'), ('manual', 'Asignado Manualmente'), ('sin_resolver', 'Sin Resolver')], db_index=True, default='sin_resolver', max_length=20)),
+                ('similitud', models.FloatField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('empleado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='identidades_registro', to='custom_auth.empleado')),
+            ],
+            options={
+                'ordering': ['nombre_registro'],
+            },
+        ),
+    ]
@@ -0,0 +1,145 @@
+# Generated by Django 5.2 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+DIMENSIONES = ['time_entry_status', 'task', 'employee', 'employee_group', 'manager', 'ot', 'planta']
+
+DIMENSION_CHOICES = [
+    ('time_entry_status', 'Estado del Registro'),
+    ('task', 'Tarea'),
+    ('employee', 'Empleado'),
+    ('employee_group', 'Grupo de Empleados'),
+    ('manager', 'Manager'),
+    ('ot', 'OT'),
+    ('planta', 'Planta'),
+]
+
+INDICES = [
+    ('planta', 'registrohoras_fecha_planta'),
+    ('ot', 'registrohoras_fecha_ot'),
+    ('employee_group', 'registrohoras_fecha_grupo'),
+    ('manager', 'registrohoras_fecha_manager'),
+]
+
+
+def campo_dimension(dimension, null=False):
+    return models.ForeignKey(
+        null=null, db_index=False, limit_choices_to={'dimension': dimension},
+        on_delete=django.db.models.deletion.PROTECT, related_name='+', to='proyectos.valordimension'
+    )
+
+
+def codificar_dimensiones(apps, schema_editor):
+    """Crea un ValorDimension por cada valor distinto de cada columna y guarda su id en el registro"""
+    RegistroHoras = apps.get_model('proyectos', 'RegistroHoras')
+    ValorDimension = apps.get_model('proyectos', 'ValorDimension')
+
+    for dimension in DIMENSIONES:
+        valores = RegistroHoras.objects.values_list(dimension, flat=True).order_by().distinct()
+        ValorDimension.objects.bulk_create(
+            [ValorDimension(dimension=dimension, valor=valor) for valor in valores],
+            batch_size=1000
+        )
+        RegistroHoras.objects.update(**{
+            f'{dimension}_id_valor': Subquery(
+                ValorDimension.objects.filter(dimension=dimension, valor=OuterRef(dimension)).values('id')[:1]
+            )
+        })
+
+
+def decodificar_dimensiones(apps, schema_editor):
+    """Vuelve a copiar el texto de cada dimensión en el registro"""
+    RegistroHoras = apps.get_model('proyectos', 'RegistroHoras')
+    ValorDimension = apps.get_model('proyectos', 'ValorDimension')
+
+    for dimension in DIMENSIONES:
+        RegistroHoras.objects.update(**{
+            dimension: Subquery(
+                ValorDimension.objects.filter(id=OuterRef(f'{dimension}_id_valor')).values('valor')[:1]
+            )
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0011_identidadempleado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValorDimension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=DIMENSION_CHOICES, max_length=20)),
+                ('valor', models.CharField(max_length=200)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'valor'), name='valordimension_unico')],
+            },
+        ),
+        # La staging solo tiene filas durante una carga: se vuelve a crear vacía
+        migrations.DeleteModel(
+            name='RegistroHorasStaging',
+        ),
+        migrations.CreateModel(
+            name='RegistroHorasStaging',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carga', models.CharField(db_index=True, max_length=32)),
+                ('date', models.DateField()),
+                ('time_entry_status', campo_dimension('time_entry_status')),
+                ('task', campo_dimension('task')),
+                ('hours_worked', models.IntegerField()),
+                ('employee', campo_dimension('employee')),
+                ('employee_group', campo_dimension('employee_group')),
+                ('manager', campo_dimension('manager')),
+                ('project_status', models.BooleanField()),
+                ('ot', campo_dimension('ot')),
+                ('planta', campo_dimension('planta')),
+                ('row_hash', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='registrohoras',
+            name='registrohoras_llave_natural',
+        ),
+        *[
+            migrations.RemoveIndex(model_name='registrohoras', name=nombre)
+            for _, nombre in INDICES
+        ],
+        *[
+            migrations.AddField(
+                model_name='registrohoras',
+                name=f'{dimension}_id_valor',
+                field=campo_dimension(dimension, null=True),
+            )
+            for dimension in DIMENSIONES
+        ],
+        migrations.RunPython(codificar_dimensiones, decodificar_dimensiones),
+        *[
+            migrations.RemoveField(model_name='registrohoras', name=dimension)
+            for dimension in DIMENSIONES
+        ],
+        *[
+            migrations.RenameField(model_name='registrohoras', old_name=f'{dimension}_id_valor', new_name=dimension)
+            for dimension in DIMENSIONES
+        ],
+        *[
+            migrations.AlterField(model_name='registrohoras', name=dimension, field=campo_dimension(dimension))
+            for dimension in DIMENSIONES
+        ],
+        migrations.AddConstraint(
+            model_name='registrohoras',
+            constraint=models.UniqueConstraint(fields=('date', 'employee', 'task'), name='registrohoras_llave_natural'),
+        ),
+        *[
+            migrations.AddIndex(
+                model_name='registrohoras',
+                index=models.Index(fields=['date', dimension], name=nombre),
+            )
+            for dimension, nombre in INDICES
+        ],
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0012_valordimension'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registrohoras',
+            index=models.Index(fields=['date', 'project_status', 'ot', 'hours_worked', 'employee'], name='registrohoras_fecha_cubre'),
+        ),
+    ]
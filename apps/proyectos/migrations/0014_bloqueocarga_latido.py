@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 11:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0013_registrohoras_fecha_cubre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloqueocarga',
+            name='host',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='bloqueocarga',
+            name='latido',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='bloqueocarga',
+            name='pid',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0015_trabajocarga_proceso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajocarga',
+            name='duplicados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0016_trabajocarga_duplicados'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registrohorasstaging',
+            name='carga',
+            field=models.CharField(max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='registrohorasstaging',
+            index=models.Index(fields=['carga', 'date', 'employee', 'task'], name='staging_carga_llave'),
+        ),
+    ]
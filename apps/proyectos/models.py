@@ -1,4 +1,12 @@
-from django.db import models
+import difflib
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from apps.custom_auth.models import Empleado
 from django.utils import timezone
 
@@ -47,22 +55,514 @@ class AsignacionProyecto(models.Model):
     costo_hora = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     tarifa_hora = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
 
+class ValorDimension(models.Model):
+    """
+    Valores de texto de RegistroHoras guardados una sola vez por dimensión; los registros
+    guardan solo el id. Los valores nunca se modifican ni se borran, así que el id de cada
+    uno se puede guardar en memoria durante toda la vida del proceso.
+    """
+    DIMENSION_CHOICES = [
+        ('time_entry_status', 'Estado del Registro'),
+        ('task', 'Tarea'),
+        ('employee', 'Empleado'),
+        ('employee_group', 'Grupo de Empleados'),
+        ('manager', 'Manager'),
+        ('ot', 'OT'),
+        ('planta', 'Planta'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    valor = models.CharField(max_length=200)
+
+    # Caché en memoria: (dimension, valor) -> id e id -> valor
+    _ids = {}
+    _valores = {}
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'valor'], name='valordimension_unico'),
+        ]
+
+    def __str__(self):
+        return self.valor
+
+    @classmethod
+    def guardar_en_cache(cls, filas):
+        """Guarda en la caché las tuplas (id, dimension, valor), salvo dentro de una transacción que podría revertirse"""
+        if transaction.get_connection().in_atomic_block:
+            return
+        for id_, dimension, valor in filas:
+            cls._ids[(dimension, valor)] = id_
+            cls._valores[id_] = valor
+
+    @classmethod
+    def ids(cls, dimension, valores):
+        """
+        Diccionario valor -> id de los valores de una dimensión. Los que no están en la caché
+        se buscan en una consulta y los que no existen se crean en bloque.
+        """
+        valores = set(valores)
+        ids = {valor: cls._ids[(dimension, valor)] for valor in valores if (dimension, valor) in cls._ids}
+        faltantes = list(valores - ids.keys())
+        if faltantes:
+            # Otra carga pudo crear el mismo valor: ignore_conflicts y leer los ids de la base de datos
+            cls.objects.bulk_create(
+                [cls(dimension=dimension, valor=valor) for valor in faltantes],
+                batch_size=1000, ignore_conflicts=True
+            )
+            filas = list(cls.objects.filter(dimension=dimension, valor__in=faltantes).values_list('id', 'dimension', 'valor'))
+            cls.guardar_en_cache(filas)
+            ids.update({valor: id_ for id_, _, valor in filas})
+        return ids
+
+    @classmethod
+    def valores(cls, ids):
+        """Diccionario id -> valor; los que no están en la caché se leen en una consulta"""
+        ids = set(ids)
+        valores = {id_: cls._valores[id_] for id_ in ids if id_ in cls._valores}
+        faltantes = ids - valores.keys()
+        if faltantes:
+            filas = list(cls.objects.filter(id__in=faltantes).values_list('id', 'dimension', 'valor'))
+            cls.guardar_en_cache(filas)
+            valores.update({id_: valor for id_, _, valor in filas})
+        return valores
+
+
+def campo_dimension(dimension):
+    """Llave foránea a ValorDimension para una columna de texto de RegistroHoras"""
+    return models.ForeignKey(
+        ValorDimension, on_delete=models.PROTECT, related_name='+', db_index=False,
+        limit_choices_to={'dimension': dimension}
+    )
+
+
 class RegistroHoras(models.Model):
 
     date= models.DateField()
-    time_entry_status = models.CharField(max_length=100)
-    task = models.CharField(max_length=200, default='Sin Asignación')
+    time_entry_status = campo_dimension('time_entry_status')
+    task = campo_dimension('task')
     hours_worked= models.IntegerField()
-    employee = models.CharField(max_length=100)
-    employee_group = models.CharField(max_length=100)
-    manager = models.CharField(max_length=100)
+    employee = campo_dimension('employee')
+    employee_group = campo_dimension('employee_group')
+    manager = campo_dimension('manager')
+    project_status = models.BooleanField()
+    ot = campo_dimension('ot')
+    planta = campo_dimension('planta')
+    # Hash de los campos actualizables (sus valores de texto); la carga lo usa para escribir solo filas que cambiaron
+    row_hash = models.BigIntegerField(default=0)
+
+    # Columnas guardadas como ids de ValorDimension
+    DIMENSIONES = ['time_entry_status', 'task', 'employee', 'employee_group', 'manager', 'ot', 'planta']
+
+    class Meta:
+        constraints = [
+            # Llave natural usada por la carga masiva para resolver conflictos
+            models.UniqueConstraint(fields=['date', 'employee', 'task'], name='registrohoras_llave_natural'),
+        ]
+        indexes = [
+            # Cubre los totales por día del resumen diario (horas, horas facturadas y empleados)
+            models.Index(
+                fields=['date', 'project_status', 'ot', 'hours_worked', 'employee'],
+                name='registrohoras_fecha_cubre'
+            ),
+            # Desglose de KPIs de horas por dimensión dentro de un rango de fechas
+            models.Index(fields=['date', 'planta'], name='registrohoras_fecha_planta'),
+            models.Index(fields=['date', 'ot'], name='registrohoras_fecha_ot'),
+            models.Index(fields=['date', 'employee_group'], name='registrohoras_fecha_grupo'),
+            models.Index(fields=['date', 'manager'], name='registrohoras_fecha_manager'),
+        ]
+
+    def __str__(self):
+        # Sin la OT precargada (select_related) se toma de la caché de valores, no una consulta por registro
+        if self._meta.get_field('ot').is_cached(self):
+            return self.ot.valor
+        return ValorDimension.valores([self.ot_id]).get(self.ot_id, '')
+
+
+# Horas facturadas: proyectos activos con OT asignada. La OT vacía se busca con una
+# subconsulta que SQLite evalúa una sola vez, en lugar de unir cada registro con ValorDimension
+FILTRO_FACTURADAS = Q(project_status=True) & ~Q(ot__in=ValorDimension.objects.filter(dimension='ot', valor=''))
+
+
+class ResumenDiarioHoras(models.Model):
+    """
+    Totales de RegistroHoras por día. Los KPIs leen de aquí en lugar de agregar
+    cada registro; la carga de horas lo mantiene al día para las fechas que toca.
+    """
+    date = models.DateField(unique=True)
+    total_horas = models.BigIntegerField(default=0)
+    # Horas de proyectos activos con OT asignada
+    horas_facturadas = models.BigIntegerField(default=0)
+    registros = models.PositiveIntegerField(default=0)
+    empleados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: {self.total_horas} horas"
+
+    @staticmethod
+    def totales_por_dia(fechas=None):
+        """Consulta de los totales de RegistroHoras agrupados por día (de las fechas indicadas o de todas)"""
+        registros = RegistroHoras.objects.all()
+        if fechas is not None:
+            registros = registros.filter(date__in=fechas)
+
+        return registros.values('date').annotate(
+            total_horas=Sum('hours_worked'),
+            horas_facturadas=Sum('hours_worked', filter=FILTRO_FACTURADAS),
+            registros=Count('id'),
+            empleados=Count('employee', distinct=True),
+        ).order_by()
+
+    @classmethod
+    def recalcular(cls, fechas=None):
+        """
+        Vuelve a calcular el resumen de las fechas indicadas (todas si fechas es None)
+        a partir de RegistroHoras. Retorna el número de días con registros.
+        """
+        resumenes = cls.objects.all()
+        if fechas is not None:
+            fechas = list(fechas)
+            resumenes = resumenes.filter(date__in=fechas)
+        totales = cls.totales_por_dia(fechas)
+
+        with transaction.atomic():
+            resumenes.delete()
+            creados = cls.objects.bulk_create(
+                [
+                    cls(
+                        date=fila['date'],
+                        total_horas=fila['total_horas'] or 0,
+                        horas_facturadas=fila['horas_facturadas'] or 0,
+                        registros=fila['registros'],
+                        empleados=fila['empleados'],
+                    )
+                    for fila in totales
+                ],
+                batch_size=1000
+            )
+        return len(creados)
+
+
+@receiver(pre_save, sender=RegistroHoras)
+def recordar_fecha_anterior(sender, instance, **kwargs):
+    """Guarda la fecha que tenía el registro para recalcular también ese día si cambia"""
+    instance._fecha_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=RegistroHoras)
+def actualizar_resumen_diario(sender, instance, **kwargs):
+    """Mantiene el resumen diario cuando se edita un registro fuera de la carga masiva"""
+    fechas = {instance.date, getattr(instance, '_fecha_anterior', None)} - {None}
+    ResumenDiarioHoras.recalcular(sorted(fechas))
+
+
+def normalizar_nombre(nombre):
+    """Nombre sin acentos, en minúsculas, sin signos y con un solo espacio entre palabras"""
+    sin_acentos = ''.join(
+        c for c in unicodedata.normalize('NFKD', nombre or '') if not unicodedata.combining(c)
+    )
+    return ' '.join(re.sub(r'[^\w]+', ' ', sin_acentos.casefold()).split())
+
+
+class IdentidadEmpleado(models.Model):
+    """
+    Relaciona cada nombre de empleado del registro de horas (texto libre) con un Empleado.
+    La carga de horas resuelve los nombres nuevos; los que no se pueden resolver quedan
+    pendientes de revisión con empleado vacío.
+    """
+    METODO_CHOICES = [
+        ('exacto', 'Coincidencia Exacta'),
+        ('similitud', 'Por Similitud'),
+        ('manual', 'Asignado Manualmente'),
+        ('sin_resolver', 'Sin Resolver'),
+    ]
+
+    # Similitud mínima entre dos palabras para considerarlas la misma (p. ej. Villareal/Villarreal)
+    UMBRAL_PALABRA = 0.8
+
+    # Tal como aparece en RegistroHoras.employee
+    nombre_registro = models.CharField(max_length=100, unique=True)
+    nombre_normalizado = models.CharField(max_length=100, db_index=True)
+    empleado = models.ForeignKey(
+        Empleado, on_delete=models.SET_NULL, null=True, blank=True, related_name='identidades_registro'
+    )
+    metodo = models.CharField(max_length=20, choices=METODO_CHOICES, default='sin_resolver', db_index=True)
+    similitud = models.FloatField(null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['nombre_registro']
+
+    def __str__(self):
+        return f"{self.nombre_registro} -> {self.empleado or 'sin resolver'}"
+
+    @staticmethod
+    def indice_empleados():
+        """
+        Palabras normalizadas de cada Empleado y un índice invertido palabra -> empleados,
+        para comparar cada nombre solo contra los empleados que comparten alguna palabra
+        """
+        empleados = {}
+        indice = {}
+        for empleado_id, nombre in Empleado.objects.values_list('id', 'nombre_completo'):
+            palabras = normalizar_nombre(nombre).split()
+            empleados[empleado_id] = palabras
+            for palabra in palabras:
+                indice.setdefault(palabra, set()).add(empleado_id)
+        return empleados, indice
+
+    @classmethod
+    def similitudes(cls, nombre_normalizado, empleados, indice):
+        """
+        Empleados candidatos para un nombre normalizado, ordenados de mayor a menor similitud.
+        Retorna (empleado_id, similitud, cubre) donde cubre indica que cada palabra del nombre
+        tiene una parecida en el del empleado, sin importar el orden (nombres o apellidos primero)
+        """
+        palabras = nombre_normalizado.split()
+        candidatos = set().union(*(indice.get(palabra, set()) for palabra in palabras))
+        if not candidatos:
+            # Ninguna palabra idéntica: comparar contra todos (errores de captura en todas las palabras)
+            candidatos = empleados.keys()
+
+        clave = ' '.join(sorted(palabras))
+        resultados = []
+        for empleado_id in candidatos:
+            palabras_empleado = empleados[empleado_id]
+            cubre = all(
+                palabra in palabras_empleado or difflib.get_close_matches(
+                    palabra, palabras_empleado, n=1, cutoff=cls.UMBRAL_PALABRA
+                )
+                for palabra in palabras
+            )
+            similitud = difflib.SequenceMatcher(None, clave, ' '.join(sorted(palabras_empleado))).ratio()
+            resultados.append((empleado_id, similitud, cubre))
+        resultados.sort(key=lambda resultado: (resultado[2], resultado[1]), reverse=True)
+        return resultados
+
+    @classmethod
+    def emparejar(cls, nombre_normalizado, empleados, indice):
+        """
+        Resuelve un nombre normalizado. Retorna (empleado_id, similitud, metodo); es exacto si tiene
+        las mismas palabras que el empleado y por similitud si todas sus palabras (al menos dos)
+        aparecen en un único empleado. En cualquier otro caso queda sin resolver.
+        """
+        palabras = nombre_normalizado.split()
+        iguales = [
+            empleado_id for empleado_id in indice.get(palabras[0], ())
+            if sorted(empleados[empleado_id]) == sorted(palabras)
+        ] if palabras else []
+        if len(iguales) == 1:
+            return iguales[0], 1.0, 'exacto'
+
+        if len(palabras) >= 2:
+            cubiertos = [r for r in cls.similitudes(nombre_normalizado, empleados, indice) if r[2]]
+            # Dos empleados que cubren el nombre por igual es ambiguo
+            if cubiertos and (len(cubiertos) == 1 or cubiertos[0][1] > cubiertos[1][1]):
+                return cubiertos[0][0], round(cubiertos[0][1], 3), 'similitud'
+
+        return None, None, 'sin_resolver'
+
+    @classmethod
+    def resolver(cls, nombres, reintentar=False):
+        """
+        Registra los nombres del registro de horas que aún no tienen identidad y les busca
+        empleado. Con reintentar también vuelve a buscar los que quedaron sin resolver (p. ej.
+        tras dar de alta empleados); las asignaciones manuales nunca se tocan.
+        Retorna el número de identidades nuevas, resueltas y pendientes.
+        """
+        nombres = {nombre for nombre in nombres if nombre}
+        existentes = dict(
+            cls.objects.filter(nombre_registro__in=nombres).values_list('nombre_registro', 'id')
+        )
+        nuevos = nombres - existentes.keys()
+        pendientes = list(cls.objects.filter(metodo='sin_resolver')) if reintentar else []
+        if not nuevos and not pendientes:
+            return {'nuevos': 0, 'resueltos': 0, 'sin_resolver': cls.objects.filter(metodo='sin_resolver').count()}
+
+        empleados, indice = cls.indice_empleados()
+
+        identidades = []
+        for nombre in sorted(nuevos):
+            normalizado = normalizar_nombre(nombre)
+            empleado_id, similitud, metodo = cls.emparejar(normalizado, empleados, indice)
+            identidades.append(cls(
+                nombre_registro=nombre, nombre_normalizado=normalizado,
+                empleado_id=empleado_id, similitud=similitud, metodo=metodo,
+            ))
+        # Otra carga pudo registrar el mismo nombre entre la consulta y la inserción
+        cls.objects.bulk_create(identidades, batch_size=1000, ignore_conflicts=True)
+
+        resueltas = []
+        for identidad in pendientes:
+            identidad.empleado_id, identidad.similitud, identidad.metodo = cls.emparejar(
+                identidad.nombre_normalizado, empleados, indice
+            )
+            if identidad.empleado_id:
+                identidad.actualizado_en = timezone.now()
+                resueltas.append(identidad)
+        cls.objects.bulk_update(resueltas, ['empleado', 'similitud', 'metodo', 'actualizado_en'], batch_size=1000)
+
+        return {
+            'nuevos': len(identidades),
+            'resueltos': sum(1 for identidad in identidades if identidad.empleado_id) + len(resueltas),
+            'sin_resolver': cls.objects.filter(metodo='sin_resolver').count(),
+        }
+
+
+class RegistroHorasStaging(models.Model):
+    """
+    Filas de una carga en curso, una por llave natural más las versiones que cambian dentro
+    del archivo. La carga escribe aquí por lotes, reconoce las llaves repetidas consultando
+    esta tabla y al terminar aplica sobre RegistroHoras, en una sola transacción corta,
+    solo las filas nuevas o modificadas.
+    """
+    carga = models.CharField(max_length=32)
+    date = models.DateField()
+    time_entry_status = campo_dimension('time_entry_status')
+    task = campo_dimension('task')
+    hours_worked = models.IntegerField()
+    employee = campo_dimension('employee')
+    employee_group = campo_dimension('employee_group')
+    manager = campo_dimension('manager')
     project_status = models.BooleanField()
-    ot = models.CharField(max_length=100)
-    planta = models.CharField(max_length=100)
-    
+    ot = campo_dimension('ot')
+    planta = campo_dimension('planta')
+    row_hash = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Búsqueda de las llaves ya preparadas por la carga y deduplicación al fusionar
+            models.Index(fields=['carga', 'date', 'employee', 'task'], name='staging_carga_llave'),
+        ]
+
+    def __str__(self):
+        return f"{self.carga} - {self.ot.valor}"
 
 
+class BloqueoCarga(models.Model):
+    """
+    Bloqueo consultivo: mientras exista la fila, ninguna otra carga con el mismo nombre puede escribir.
+    La carga que lo tiene renueva el latido en cada bloque; otra carga lo toma si el latido
+    es viejo o si el proceso dueño ya no existe.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    propietario = models.CharField(max_length=32)
+    # Proceso que tiene el bloqueo, para saber si sigue vivo
+    host = models.CharField(max_length=255, blank=True)
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    adquirido_en = models.DateTimeField(auto_now_add=True)
+    latido = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.propietario} en {self.host}:{self.pid})"
+
+
+
+
+class TrabajoCarga(models.Model):
+    """Carga de un archivo de registro de horas procesada en segundo plano"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+
+    ETAPA_CHOICES = [
+        ('en_cola', 'En Cola'),
+        ('esperando', 'Esperando Otra Carga'),
+        ('leyendo', 'Leyendo Archivo'),
+        ('escribiendo', 'Escribiendo Registros'),
+        ('fusionando', 'Aplicando Cambios'),
+        ('finalizado', 'Finalizado'),
+    ]
+
+    archivo = models.CharField(max_length=255)
+    ruta = models.CharField(max_length=500, blank=True)
+    codificacion = models.CharField(max_length=30, blank=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    # Proceso en cuyo pool quedó el trabajo; si termina, el trabajo no se va a completar
+    host = models.CharField(max_length=255, blank=True)
+    pid = models.PositiveIntegerField(null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    etapa = models.CharField(max_length=20, choices=ETAPA_CHOICES, default='en_cola')
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    sin_cambios = models.PositiveIntegerField(default=0)
+    # Filas cuya llave natural (date, employee, task) ya apareció antes en el mismo archivo
+    duplicados = models.PositiveIntegerField(default=0)
+    errores = models.PositiveIntegerField(default=0)
+    mensaje_error = models.TextField(blank=True)
+    tiempos = models.JSONField(default=dict, blank=True)
+    # Conteos por archivo cuando la carga es un ZIP con varios archivos: clasificación de sus
+    # filas al leerlo, no lo que se escribió (eso son los totales de arriba)
+    detalle_archivos = models.JSONField(default=dict, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+    # Último avance registrado
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+
+    def __str__(self):
+        return f"Carga {self.id} - {self.archivo} ({self.estado})"
+
+
+class ArchivoCarga(models.Model):
+    """Archivos de registro de horas ya subidos, identificados por el SHA-256 de su contenido"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    archivo = models.CharField(max_length=255)
+    tamano = models.PositiveBigIntegerField(default=0)
+    trabajo = models.ForeignKey(TrabajoCarga, on_delete=models.CASCADE, related_name='archivos')
+    fecha_min = models.DateField(null=True, blank=True)
+    fecha_max = models.DateField(null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+
     def __str__(self):
-        return self.ot 
+        return f"{self.archivo} ({self.sha256[:12]})"
+
+    def solapados(self):
+        """Otros archivos cuyo rango de fechas se traslapa con el de este"""
+        if not self.fecha_min or not self.fecha_max:
+            return ArchivoCarga.objects.none()
+        return ArchivoCarga.objects.filter(
+            fecha_min__lte=self.fecha_max,
+            fecha_max__gte=self.fecha_min
+        ).exclude(id=self.id)
 
+    @staticmethod
+    def solapados_por_archivo(archivos):
+        """
+        Diccionario id -> archivos que se traslapan con cada uno de archivos, con una sola
+        consulta: se leen los que tocan el rango conjunto y se emparejan en memoria
+        """
+        con_rango = [archivo for archivo in archivos if archivo.fecha_min and archivo.fecha_max]
+        solapados = {archivo.id: [] for archivo in archivos}
+        if not con_rango:
+            return solapados
 
+        candidatos = list(ArchivoCarga.objects.filter(
+            fecha_min__lte=max(archivo.fecha_max for archivo in con_rango),
+            fecha_max__gte=min(archivo.fecha_min for archivo in con_rango)
+        ).values('id', 'archivo', 'fecha_min', 'fecha_max'))
+        for archivo in con_rango:
+            solapados[archivo.id] = [
+                candidato for candidato in candidatos
+                if candidato['id'] != archivo.id
+                and candidato['fecha_min'] <= archivo.fecha_max
+                and candidato['fecha_max'] >= archivo.fecha_min
+            ]
+        return solapados
@@ -1,8 +1,5 @@
 from rest_framework import serializers
-from apps.dashboard.models import KpiInputData
-
-from rest_framework import serializers
-from .models import Proyecto, AsignacionProyecto
+from .models import Proyecto, AsignacionProyecto, RegistroHoras, TrabajoCarga, ArchivoCarga, IdentidadEmpleado
 from apps.custom_auth.models import Empleado
 from apps.custom_auth.serializers import EmpleadoSerializer
 
@@ -36,9 +33,56 @@ class ProyectoSerializer(serializers.ModelSerializer):
         ]
 
 class RegistroHorasSerializer(serializers.ModelSerializer):
+    # Las dimensiones se guardan como ids de ValorDimension; se muestra su texto
+    time_entry_status = serializers.SlugRelatedField(slug_field='valor', read_only=True)
+    task = serializers.SlugRelatedField(slug_field='valor', read_only=True)
+    employee = serializers.SlugRelatedField(slug_field='valor', read_only=True)
+    employee_group = serializers.SlugRelatedField(slug_field='valor', read_only=True)
+    manager = serializers.SlugRelatedField(slug_field='valor', read_only=True)
+    ot = serializers.SlugRelatedField(slug_field='valor', read_only=True)
+
     class Meta:
-        model = KpiInputData
+        model = RegistroHoras
         fields = [
             'date', 'time_entry_status', 'task', 'hours_worked',
             'employee', 'employee_group', 'manager', 'project_status', 'ot'
-        ]
\ No newline at end of file
+        ]
+
+class TrabajoCargaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TrabajoCarga
+        fields = [
+            'id', 'archivo', 'codificacion', 'estado', 'etapa', 'filas_procesadas',
+            'creados', 'actualizados', 'sin_cambios', 'duplicados', 'errores', 'mensaje_error',
+            'tiempos', 'detalle_archivos', 'creado_en', 'iniciado_en', 'finalizado_en', 'actualizado_en'
+        ]
+
+class ArchivoCargaSerializer(serializers.ModelSerializer):
+    solapados = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ArchivoCarga
+        fields = [
+            'id', 'archivo', 'sha256', 'tamano', 'trabajo',
+            'fecha_min', 'fecha_max', 'creado_en', 'solapados'
+        ]
+
+    def get_solapados(self, obj):
+        """
+        Archivos cargados cuyo rango de fechas se traslapa con este. Para listas, la vista
+        los calcula todos juntos (ArchivoCarga.solapados_por_archivo) y los pasa en el contexto.
+        """
+        if 'solapados' in self.context:
+            return self.context['solapados'].get(obj.id, [])
+        return list(obj.solapados().values('id', 'archivo', 'fecha_min', 'fecha_max'))
+
+class IdentidadEmpleadoSerializer(serializers.ModelSerializer):
+    empleado_nombre = serializers.CharField(source='empleado.nombre_completo', read_only=True, default=None)
+
+    class Meta:
+        model = IdentidadEmpleado
+        fields = [
+            'id', 'nombre_registro', 'nombre_normalizado', 'empleado', 'empleado_nombre',
+            'metodo', 'similitud', 'actualizado_en'
+        ]
+        read_only_fields = ['nombre_registro', 'nombre_normalizado', 'metodo', 'similitud', 'actualizado_en']
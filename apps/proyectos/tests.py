@@ -1,3 +1,116 @@
+import csv
+import os
+import tempfile
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from apps.proyectos.models import RegistroHoras
+from apps.proyectos.utils import LoadData
+
+ENCABEZADOS = [
+    'Date', 'Time Entry Status', 'Task', 'Hours Worked', 'Employee',
+    'Employee Group', 'Manager', 'Project Status (Count)', 'Project',
+]
+
+
+def fila(fecha, empleado, tarea, horas):
+    """Fila del registro de horas en el formato de la exportación"""
+    return [fecha, 'Submitted', tarea, horas, empleado, 'Control', 'Laura Medina', 'Active', 'OT24-3-0200 Planta Norte']
+
+
+class CargaRegistroHorasTests(TestCase):
+    """Conteos de la carga de horas al volver a subir un archivo"""
+
+    FILAS = [
+        fila('2024-03-04', 'Ana Ruiz', '04.01 Juntas', 8),
+        fila('2024-03-04', 'Luis Soto', '04.01 Juntas', 6),
+        fila('2024-03-05', 'Ana Ruiz', '10.01 Manejo de Proyecto', 7),
+    ]
+
+    def escribir_csv(self, filas, encoding='utf-8'):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding=encoding, newline='', delete=False) as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(ENCABEZADOS)
+            escritor.writerows(filas)
+        self.addCleanup(os.remove, archivo.name)
+        return archivo.name
+
+    def cargar(self, filas):
+        return LoadData.cargar_archivo(self.escribir_csv(filas))
+
+    def conteos(self, resumen):
+        return {clave: resumen[clave] for clave in ('creados', 'actualizados', 'sin_cambios', 'duplicados', 'errores')}
+
+    def test_archivo_sin_cambios(self):
+        self.cargar(self.FILAS)
+        resumen = self.cargar(self.FILAS)
+        self.assertEqual(
+            self.conteos(resumen),
+            {'creados': 0, 'actualizados': 0, 'sin_cambios': 3, 'duplicados': 0, 'errores': 0}
+        )
+
+    def test_una_fila_modificada(self):
+        self.cargar(self.FILAS)
+        filas = [list(f) for f in self.FILAS]
+        filas[1][3] = 9
+        resumen = self.cargar(filas)
+        self.assertEqual(
+            self.conteos(resumen),
+            {'creados': 0, 'actualizados': 1, 'sin_cambios': 2, 'duplicados': 0, 'errores': 0}
+        )
+        self.assertEqual(RegistroHoras.objects.get(employee__valor='Luis Soto').hours_worked, 9)
+
+    def test_llave_repetida_en_el_archivo(self):
+        filas = self.FILAS + [fila('2024-03-04', 'Ana Ruiz', '04.01 Juntas', 5)]
+        resumen = self.cargar(filas)
+        self.assertEqual(
+            self.conteos(resumen),
+            {'creados': 3, 'actualizados': 0, 'sin_cambios': 0, 'duplicados': 1, 'errores': 0}
+        )
+        # Gana la última versión de la llave
+        self.assertEqual(
+            RegistroHoras.objects.get(employee__valor='Ana Ruiz', task__valor='04.01 Juntas').hours_worked, 5
+        )
+
+    def test_llave_repetida_en_otro_bloque(self):
+        # Bloques de dos filas: la repetición se reconoce por lo ya preparado en staging
+        filas = self.FILAS + [fila('2024-03-04', 'Ana Ruiz', '04.01 Juntas', 5)]
+        with mock.patch.object(LoadData, 'TAMANO_BLOQUE', 2):
+            primera = self.cargar(filas)
+            segunda = self.cargar(filas)
+        self.assertEqual(
+            self.conteos(primera),
+            {'creados': 3, 'actualizados': 0, 'sin_cambios': 0, 'duplicados': 1, 'errores': 0}
+        )
+        self.assertEqual(
+            self.conteos(segunda),
+            {'creados': 0, 'actualizados': 0, 'sin_cambios': 3, 'duplicados': 1, 'errores': 0}
+        )
+        self.assertEqual(RegistroHoras.objects.count(), 3)
+
+
+class CodificacionTests(TestCase):
+    """Detección de la codificación de CSV sin BOM"""
+
+    def test_cp1252_con_acento_despues_de_la_muestra(self):
+        # Las primeras filas son ASCII y ocupan más que la muestra; el primer acento llega después
+        filas = [
+            fila('2024-03-04', f'Empleado {numero}', '04.01 Juntas', 8)
+            for numero in range(LoadData.TAMANO_MUESTRA // 60)
+        ]
+        filas.append(fila('2024-03-04', 'José Núñez', '04.01 Juntas y Organización', 8))
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='cp1252', newline='', delete=False) as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(ENCABEZADOS)
+            escritor.writerows(filas)
+        self.addCleanup(os.remove, archivo.name)
+        with open(archivo.name, 'rb') as binario:
+            self.assertTrue(binario.read(LoadData.TAMANO_MUESTRA).isascii())
+
+        self.assertEqual(LoadData.detectar_codificacion(archivo.name), LoadData.UTF8_O_CP1252)
+        resumen = LoadData.cargar_archivo(archivo.name)
+        self.assertEqual(resumen['creados'], len(filas))
+        self.assertTrue(
+            RegistroHoras.objects.filter(employee__valor='José Núñez', task__valor='04.01 Juntas y Organización').exists()
+        )
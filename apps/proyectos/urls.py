@@ -13,4 +13,9 @@ urlpatterns = [
     path('asignaciones/', views.AsignacionProyectoListCreateView.as_view(), name='asignacion-list-create'),
     path('asignaciones/<int:pk>/', views.AsignacionProyectoRetrieveUpdateDestroyView.as_view(), name='asignacion-detail'),
     path("registro_horas/upload/", views.upload_csv, name="upload_registro_horas"),
+    path("registro_horas/jobs/<int:trabajo_id>/", views.estado_carga, name="estado_carga_registro_horas"),
+    path("registro_horas/uploads/", views.view_archivos_carga, name="archivos_carga_registro_horas"),
+    path("registro_horas/identidades/", views.view_identidades_empleado, name="identidades_empleado"),
+    path("registro_horas/identidades/resolver/", views.resolver_identidades_empleado, name="resolver_identidades_empleado"),
+    path("registro_horas/identidades/<int:identidad_id>/", views.asignar_identidad_empleado, name="asignar_identidad_empleado"),
 ]
\ No newline at end of file
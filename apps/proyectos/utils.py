@@ -1,141 +1,910 @@
 import os
+import codecs
+import gzip
+import hashlib
+import io
+import multiprocessing
+import shutil
+import socket
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import timedelta
 import django
 #import threading
 import chardet
+import numpy as np
+import openpyxl
 import pandas as pd
-from django.db.models import Max
+from pandas.tseries.api import guess_datetime_format
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'KEP.settings')
 django.setup()
 
-from apps.proyectos.models import RegistroHoras
+from apps.dashboard.models import datos_modificados
+from apps.proyectos.models import (
+    BloqueoCarga, IdentidadEmpleado, RegistroHoras, RegistroHorasStaging, ResumenDiarioHoras, ValorDimension
+)
+
+class TextoUtf8OCp1252(io.TextIOBase):
+    """
+    Decodifica un archivo binario como UTF-8 mientras sea válido y, desde el primer
+    byte inválido, como cp1252 hasta el final. Para archivos cuya muestra parece UTF-8
+    pero que pueden ser exportaciones cp1252 con el primer acento más adelante.
+    """
+
+    def __init__(self, binario):
+        self.binario = binario
+        self.pendiente = b''
+        self.codificacion = 'utf-8'
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while True:
+            datos = self.binario.read(size if size is not None and size >= 0 else -1)
+            final = not datos or size is None or size < 0
+            datos, self.pendiente = self.pendiente + datos, b''
+            if self.codificacion == 'cp1252':
+                return datos.decode('cp1252', errors='replace')
+            
+            try:
+                texto, usados = codecs.utf_8_decode(datos, 'strict', final)
+            except UnicodeDecodeError as error:
+                self.codificacion = 'cp1252'
+                return datos[:error.start].decode('utf-8') + datos[error.start:].decode('cp1252', errors='replace')
+            
+            # Un carácter multibyte cortado al final del bloque espera a la siguiente lectura
+            self.pendiente = datos[usados:]
+            if texto or final:
+                return texto
+
+    def close(self):
+        self.binario.close()
+        super().close()
+
 
 class LoadData():
 
-    def convertir_a_utf8(file):
-        """Convierte cualquier archivo a UTF-8 y retorna un objeto StringIO"""
-        from io import StringIO
+    # Formatos de archivo aceptados para el registro de horas; un ZIP puede contener CSV y XLSX
+    EXTENSIONES = ('.csv', '.csv.gz', '.xlsx', '.zip')
+    EXTENSIONES_ZIP = ('.csv', '.xlsx')
+
+    # Filas por transacción en la escritura masiva de RegistroHoras
+    TAMANO_LOTE = 5000
+
+    # Filas por bloque al leer el CSV y bytes por bloque al copiarlo a disco
+    TAMANO_BLOQUE = 50000
+    TAMANO_BLOQUE_BYTES = 1024 * 1024
+
+    # Detección de codificación: BOM conocido o muestra de los primeros bytes. Una muestra
+    # UTF-8 válida no prueba que el resto lo sea: se lee con TextoUtf8OCp1252
+    TAMANO_MUESTRA = 64 * 1024
+    UTF8_O_CP1252 = 'utf-8/cp1252'
+    CONFIANZA_MINIMA = 0.8
+    BOMS = [
+        (codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF32_LE, 'utf-32'),
+        (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16'),
+    ]
+
+    LLAVE_NATURAL = ['date', 'employee', 'task']
+
+    CAMPOS_ACTUALIZABLES = [
+        'time_entry_status', 'hours_worked', 'employee_group',
+        'manager', 'project_status', 'ot', 'planta'
+    ]
+
+    # Bloqueo entre cargas: segundos que una carga espera a otra, cada cuánto renueva el
+    # latido la que lo tiene y tras cuántos segundos sin latido se considera abandonado
+    NOMBRE_BLOQUEO = 'registro_horas'
+    ESPERA_BLOQUEO = 15 * 60
+    LATIDO_BLOQUEO = 60
+    EXPIRACION_BLOQUEO = 5 * LATIDO_BLOQUEO
+
+    def extension(nombre):
+        """Extensión del archivo en minúsculas, considerando extensiones dobles como .csv.gz"""
+        nombre = nombre.lower()
+        for extension in sorted(LoadData.EXTENSIONES, key=len, reverse=True):
+            if nombre.endswith(extension):
+                return extension
+        return os.path.splitext(nombre)[1]
+
+    def abrir(ruta, modo='rb', **kwargs):
+        """Abre el archivo, descomprimiéndolo al vuelo si es .gz"""
+        if ruta.lower().endswith('.gz'):
+            return gzip.open(ruta, modo, **kwargs)
+        return open(ruta, modo, **kwargs)
+
+    def guardar_en_disco(file):
+        """
+        Copia el archivo subido a un archivo temporal en disco, bloque por bloque,
+        para que el resto del proceso no dependa de tenerlo completo en memoria.
+        Mientras copia calcula el SHA-256 del contenido.
+        Retorna (ruta, sha256); quien llama debe eliminar el archivo temporal.
+        """
+        sufijo = LoadData.extension(getattr(file, 'name', '') or '')
         
-        encodings_to_try = ['utf-16', 'utf-16-le', 'cp1252', 'utf-8', 'latin1']
+        if hasattr(file, 'seek'):
+            file.seek(0)
         
-        for encoding in encodings_to_try:
-            try:
-                file.seek(0)
-                content = file.read()
-                
-                # Decodificar con la codificación actual
-                if isinstance(content, bytes):
-                    decoded_content = content.decode(encoding)
-                else:
-                    decoded_content = content
-                
-                # Retornar como StringIO (que es UTF-8 internamente)
-                return StringIO(decoded_content)
-                
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-            except Exception:
-                continue
+        if hasattr(file, 'chunks'):
+            bloques = file.chunks(LoadData.TAMANO_BLOQUE_BYTES)
+        else:
+            bloques = iter(lambda: file.read(LoadData.TAMANO_BLOQUE_BYTES), b'')
+        
+        contenido = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=sufijo, prefix='registro_horas_') as destino:
+            for bloque in bloques:
+                contenido.update(bloque)
+                destino.write(bloque)
         
-        raise ValueError("No se pudo convertir el archivo a UTF-8")
+        return destino.name, contenido.hexdigest()
 
-    def load_csv(file):
-        # Convertir cualquier archivo a UTF-8 primero
-        file_utf8 = LoadData.convertir_a_utf8(file)
+    def detectar_codificacion(ruta):
+        """
+        Determina la codificación del archivo a partir del BOM o, si no lo tiene,
+        de una muestra de a lo más TAMANO_MUESTRA bytes. El archivo nunca se decodifica
+        completo aquí; se decodifica una sola vez al leerlo por bloques. Si la muestra es
+        UTF-8 válida retorna UTF8_O_CP1252, porque el resto del archivo aún puede no serlo.
+        """
+        with LoadData.abrir(ruta, 'rb') as archivo:
+            muestra = archivo.read(LoadData.TAMANO_MUESTRA)
         
-        # Ahora leer con UTF-8 garantizado
-        df = pd.read_csv(file_utf8, encoding='utf-8')
+        for bom, encoding in LoadData.BOMS:
+            if muestra.startswith(bom):
+                return encoding
         
-        print(f"Total de filas en el CSV: {len(df)}")
+        # UTF-16 sin BOM: la mitad de los bytes de texto ASCII son nulos
+        if muestra.count(b'\x00') > len(muestra) // 4:
+            nulos_impares = muestra[1::2].count(b'\x00')
+            return 'utf-16-le' if nulos_impares >= muestra[0::2].count(b'\x00') else 'utf-16-be'
         
-        # DEBUG: Ver qué formato tienen las fechas realmente
-        print("Primeras 5 fechas en el archivo:")
-        print(df['Date'].head().tolist())
-        print(f"Tipo de datos de la columna Date: {df['Date'].dtype}")
+        # La muestra puede cortar un carácter multibyte al final, por eso final=False
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(muestra, final=False)
+            return LoadData.UTF8_O_CP1252
+        except UnicodeDecodeError:
+            pass
         
-        ultima_fecha = RegistroHoras.objects.aggregate(Max('date'))['date__max']
-        print(f"Última fecha en BD: {ultima_fecha}")
+        deteccion = chardet.detect(muestra)
+        if deteccion['encoding'] and deteccion['confidence'] >= LoadData.CONFIANZA_MINIMA:
+            return codecs.lookup(deteccion['encoding']).name
         
-        # Intentar múltiples formatos de fecha
-        df['Date'] = pd.to_datetime(df["Date"], errors='coerce', infer_datetime_format=True)
+        return 'cp1252'
+
+    def leer_csv_por_bloques(ruta, encoding=None):
+        """
+        Itera el CSV en DataFrames de a lo más TAMANO_BLOQUE filas.
+        El archivo se decodifica de forma incremental en una sola pasada mientras se lee.
+        """
+        if encoding is None:
+            encoding = LoadData.detectar_codificacion(ruta)
+        
+        if encoding == LoadData.UTF8_O_CP1252:
+            archivo = TextoUtf8OCp1252(LoadData.abrir(ruta, 'rb'))
+        else:
+            # UTF con BOM es seguro; las codificaciones de un byte adivinadas por muestra pueden fallar más adelante
+            errores = 'strict' if encoding.startswith('utf') else 'replace'
+            archivo = LoadData.abrir(ruta, 'rt', encoding=encoding, errors=errores, newline='')
+        
+        with archivo:
+            with pd.read_csv(archivo, chunksize=LoadData.TAMANO_BLOQUE) as lector:
+                for df in lector:
+                    yield df
+
+    def leer_xlsx_por_bloques(ruta):
+        """
+        Itera la primera hoja de un XLSX en DataFrames de a lo más TAMANO_BLOQUE filas.
+        openpyxl en modo read_only recorre las filas sin cargar el libro completo en memoria.
+        La primera fila se toma como encabezados.
+        """
+        libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            hoja = libro.active
+            # No confiar en las dimensiones declaradas: evita recorrer la hoja completa para calcularlas
+            hoja.reset_dimensions()
+            filas = hoja.iter_rows(values_only=True)
+            encabezados = next(filas, None)
+            if encabezados is None:
+                return
+            
+            encabezados = [str(celda).strip() if celda is not None else '' for celda in encabezados]
+            columnas = len(encabezados)
+            
+            bloque = []
+            for fila in filas:
+                # Algunos exportadores omiten las celdas vacías al final de la fila
+                if len(fila) != columnas:
+                    fila = (tuple(fila) + (None,) * columnas)[:columnas]
+                bloque.append(fila)
+                
+                if len(bloque) == LoadData.TAMANO_BLOQUE:
+                    yield pd.DataFrame(bloque, columns=encabezados)
+                    bloque = []
+            
+            if bloque:
+                yield pd.DataFrame(bloque, columns=encabezados)
+        finally:
+            libro.close()
+
+    def leer_por_bloques(ruta, encoding=None):
+        """Itera el archivo en bloques de DataFrames según su extensión (CSV, CSV.GZ o XLSX)"""
+        if LoadData.extension(ruta) == '.xlsx':
+            return LoadData.leer_xlsx_por_bloques(ruta)
+        return LoadData.leer_csv_por_bloques(ruta, encoding)
+
+    def convertir_fechas(fechas, formato=None):
+        """
+        Convierte la columna Date. Si no se conoce el formato se intenta inferir y,
+        si eso falla, se prueban formatos específicos.
+        Retorna la serie convertida y el formato detectado para reutilizarlo en los siguientes bloques.
+        """
+        if formato:
+            return pd.to_datetime(fechas, format=formato, errors='coerce'), formato
+        
+        primera = fechas.dropna().astype(str).head(1)
+        if not primera.empty:
+            formato = guess_datetime_format(primera.iloc[0])
+        
+        convertidas = pd.to_datetime(fechas, format=formato, errors='coerce')
         
         # Si sigue fallando, intentar formatos específicos
-        if df['Date'].isna().all():
+        if convertidas.isna().all():
+            formato = None
             formatos_fecha = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%m-%d-%Y']
-            for formato in formatos_fecha:
-                try:
-                    df['Date'] = pd.to_datetime(df["Date"], format=formato, errors='coerce')
-                    if not df['Date'].isna().all():
-                        print(f"Formato de fecha que funcionó: {formato}")
-                        break
-                except:
-                    continue
-        
-        print(f"Fechas después de conversión (primeras 5):")
-        print(df['Date'].head().tolist())
+            for formato_fecha in formatos_fecha:
+                convertidas = pd.to_datetime(fechas, format=formato_fecha, errors='coerce')
+                if not convertidas.isna().all():
+                    print(f"Formato de fecha que funcionó: {formato_fecha}")
+                    formato = formato_fecha
+                    break
         
+        return convertidas, formato
+
+    def preparar_bloque(df, formato_fecha=None):
+        """
+        Limpia, filtra y transforma un bloque del CSV.
+        Retorna (registros, errores, formato_fecha): los registros ya con las columnas
+        de RegistroHoras y el número de filas inválidas descartadas.
+        """
+        df['Date'], formato_fecha = LoadData.convertir_fechas(df['Date'], formato_fecha)
         df = df.dropna(subset=['Date'])
-        print(f"Filas después de limpiar fechas: {len(df)}")
         
-        # Resto del código igual...
-        df = df.sort_values(by="Date")
-        df[['OT', 'Planta']] = df['Project'].str.extract(r'((?:OT\d{2}-\d{1}-\d{3,5}|DCI-\d{2}))\s*[-–]?\s*(.*)')
-        df.drop(columns=['Project'], inplace=True)
+        df = df.sort_values(by="Date", kind="stable")
         df = df[df['Time Entry Status'] == 'Submitted']
-        print(f"Filas después de filtrar 'Submitted': {len(df)}")
         
-        if ultima_fecha:
-            df = df[df['Date'].dt.date > ultima_fecha]
-            print(f"Filas después de filtrar por fecha: {len(df)}")
+        registros, errores = LoadData.transformar_bloque(df)
+        return registros, errores, formato_fecha
+
+    def transformar_bloque(df):
+        """
+        Convierte columna por columna un bloque filtrado a los campos de RegistroHoras.
+        Las filas inválidas (horas no numéricas o sin empleado/tarea) se identifican con
+        una máscara y se descartan. Retorna (registros, errores).
+        """
+        horas = pd.to_numeric(df['Hours Worked'], errors='coerce')
+        validas = (
+            (horas.notna() | df['Hours Worked'].isna())
+            & np.isfinite(horas.fillna(0))
+            & df['Employee'].notna()
+            & df['Task'].notna()
+        )
+        errores = int((~validas).sum())
         
- 
+        df = df[validas]
+        proyecto = df['Project'].fillna('').astype(str).str.extract(r'((?:OT\d{2}-\d{1}-\d{3,5}|DCI-\d{2}))\s*[-–]?\s*(.*)')
         
+        registros = pd.DataFrame({
+            'date': df['Date'].dt.date,
+            'employee': df['Employee'].astype(str),
+            'task': df['Task'].astype(str),
+            'time_entry_status': df['Time Entry Status'].astype(str),
+            # IntegerField: las horas fraccionarias se truncan igual que al guardar con el ORM
+            'hours_worked': np.trunc(horas[validas].fillna(0)).astype('int64'),
+            'employee_group': df['Employee Group'].fillna('').astype(str),
+            'manager': df['Manager'].fillna('').astype(str),
+            'project_status': df['Project Status (Count)'].eq('Active'),
+            'ot': proyecto[0].fillna(''),
+            'planta': proyecto[1].fillna(''),
+        })
+        return registros, errores
+
+    def hash_filas(registros):
+        """
+        Hash de 64 bits (con signo, para guardarlo en un BigIntegerField) de los
+        campos actualizables de cada fila, calculado de forma vectorizada.
+        """
+        campos = registros[LoadData.CAMPOS_ACTUALIZABLES].astype({
+            'time_entry_status': str,
+            'hours_worked': 'int64',
+            'employee_group': str,
+            'manager': str,
+            'project_status': bool,
+            'ot': str,
+            'planta': str,
+        })
+        return pd.util.hash_pandas_object(campos, index=False).to_numpy().view('int64')
+
+    def codificar_dimensiones(registros):
+        """Reemplaza el texto de cada columna de dimensión por el id de su ValorDimension"""
+        return registros.assign(**{
+            dimension: registros[dimension].map(ValorDimension.ids(dimension, registros[dimension].unique()))
+            for dimension in RegistroHoras.DIMENSIONES
+        })
+
+    def escribir_bloque(registros, carga):
+        """
+        Clasifica un bloque ya transformado y lo copia a la tabla de staging de la carga.
+        Retorna (creados, actualizados, sin_cambios, duplicados, errores).
+        """
         registros_creados = 0
         registros_actualizados = 0
+        registros_sin_cambios = 0
         errores = 0
         
-        for _, row in df.iterrows():
+        # Filas repetidas en el archivo: gana la última, igual que con update_or_create
+        repetidas = registros.duplicated(subset=LoadData.LLAVE_NATURAL, keep='last')
+        registros_duplicados = int(repetidas.sum())
+        registros = registros[~repetidas]
+        
+        for inicio in range(0, len(registros), LoadData.TAMANO_LOTE):
+            lote = registros.iloc[inicio:inicio + LoadData.TAMANO_LOTE]
             try:
-                hours_worked = float(row['Hours Worked']) if pd.notna(row['Hours Worked']) else 0.0
-                
-                obj, created = RegistroHoras.objects.update_or_create(
-                    date=row['Date'],
-                    employee=row['Employee'],
-                    task=row['Task'],
-                    defaults={
-                        'time_entry_status': row['Time Entry Status'],
-                        'hours_worked': hours_worked,
-                        'employee_group': row['Employee Group'],
-                        'manager': row['Manager'],
-                        'project_status': row['Project Status (Count)'] == 'Active',
-                        'ot': row['OT'] if pd.notna(row['OT']) else '',
-                        'planta': row['Planta'] if pd.notna(row['Planta']) else ''
-                    }
+                creados, actualizados, sin_cambios, duplicados = LoadData.guardar_lote(lote, carga)
+                registros_creados += creados
+                registros_actualizados += actualizados
+                registros_sin_cambios += sin_cambios
+                registros_duplicados += duplicados
+            except DatabaseError as e:
+                print(f"Error al guardar el lote {inicio // LoadData.TAMANO_LOTE + 1}: {e}")
+                errores += len(lote)
+        
+        return registros_creados, registros_actualizados, registros_sin_cambios, registros_duplicados, errores
+
+    def hashes_por_llave(filas, llaves):
+        """Serie Int64 con el row_hash de cada llave natural de llaves (nulo si no está en filas)"""
+        if not filas:
+            return pd.Series(pd.NA, index=llaves, dtype='Int64')
+        return pd.Series(
+            [fila[-1] for fila in filas],
+            index=pd.MultiIndex.from_tuples([fila[:-1] for fila in filas]),
+            dtype='Int64'
+        ).reindex(llaves)
+
+    def guardar_lote(lote, carga):
+        """
+        Clasifica cada fila del lote por su llave natural (date, employee, task). Si la
+        llave ya está en lo preparado por esta carga, la fila es un duplicado dentro del
+        archivo; si no, se compara su hash con el guardado en RegistroHoras.
+        Todas las llaves nuevas para la carga se copian a staging, para reconocer sus
+        repeticiones en bloques posteriores sin guardarlas en memoria; una repetida solo
+        si cambió respecto a su versión anterior. RegistroHoras solo se lee; se modifica
+        después en fusionar_staging, que descarta las filas sin cambios.
+        Retorna la tupla (creados, actualizados, sin_cambios, duplicados).
+        """
+        # El hash se calcula sobre el texto; la comparación y la escritura usan los ids de las dimensiones
+        lote = LoadData.codificar_dimensiones(lote.assign(row_hash=LoadData.hash_filas(lote)))
+        llaves = pd.MultiIndex.from_frame(lote[LoadData.LLAVE_NATURAL])
+        filtros = {
+            'date__in': lote['date'].unique().tolist(),
+            'employee__in': lote['employee'].unique().tolist(),
+        }
+        
+        guardados = list(
+            RegistroHoras.objects.filter(**filtros).values_list(*LoadData.LLAVE_NATURAL, 'row_hash')
+        )
+        preparados = list(
+            RegistroHorasStaging.objects.filter(carga=carga, **filtros)
+            .order_by('id').values_list(*LoadData.LLAVE_NATURAL, 'row_hash')
+        )
+        # Una llave puede repetirse en staging si cambió entre bloques: vale la última
+        preparados = list({fila[:-1]: fila for fila in preparados}.values())
+        
+        hashes = lote['row_hash'].to_numpy()
+        hashes_preparados = LoadData.hashes_por_llave(preparados, llaves)
+        hashes_guardados = LoadData.hashes_por_llave(guardados, llaves)
+        repetidas = hashes_preparados.notna().to_numpy()
+        nuevos = ~repetidas & hashes_guardados.isna().to_numpy()
+        cambiados = ~repetidas & ~nuevos & (hashes_guardados.fillna(0).to_numpy('int64') != hashes)
+        
+        por_escribir = lote[~repetidas | (hashes_preparados.fillna(0).to_numpy('int64') != hashes)]
+        if not por_escribir.empty:
+            LoadData.insertar_staging(por_escribir, carga)
+        
+        creados = int(nuevos.sum())
+        actualizados = int(cambiados.sum())
+        duplicados = int(repetidas.sum())
+        return creados, actualizados, len(lote) - creados - actualizados - duplicados, duplicados
+
+    def columnas_registro():
+        """Campos que se copian de staging a RegistroHoras, en el orden de las sentencias SQL"""
+        return LoadData.LLAVE_NATURAL + LoadData.CAMPOS_ACTUALIZABLES + ['row_hash']
+
+    def insertar_staging(registros, carga):
+        """Inserta en staging, con un solo executemany, filas ya clasificadas como nuevas o modificadas"""
+        campos = LoadData.columnas_registro()
+        valores = [registros[campo].tolist() for campo in campos]
+        valores[campos.index('date')] = [
+            connection.ops.adapt_datefield_value(fecha) for fecha in valores[campos.index('date')]
+        ]
+        
+        qn = connection.ops.quote_name
+        opciones = RegistroHorasStaging._meta
+        columnas = ', '.join(qn(opciones.get_field(campo).column) for campo in ['carga'] + campos)
+        marcadores = ', '.join(['%s'] * (len(campos) + 1))
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {qn(opciones.db_table)} ({columnas}) VALUES ({marcadores})",
+                [(carga, *fila) for fila in zip(*valores)]
+            )
+
+    def fusionar_staging(carga):
+        """
+        Aplica sobre RegistroHoras las filas preparadas por la carga con un único
+        INSERT ... SELECT ... ON CONFLICT, de modo que las tablas que leen los KPIs
+        solo quedan bloqueadas durante esa sentencia y la actualización del resumen
+        diario de las fechas tocadas. Antes descarta de staging las versiones anteriores
+        de cada llave y las filas iguales a las de la tabla. Retorna (creados, actualizados)
+        según lo que realmente se aplicó.
+        """
+        qn = connection.ops.quote_name
+        staging = RegistroHorasStaging._meta
+        destino = RegistroHoras._meta
+        tabla_staging = qn(staging.db_table)
+        carga_col = qn(staging.get_field('carga').column)
+        
+        columnas_staging = ', '.join(qn(staging.get_field(campo).column) for campo in LoadData.columnas_registro())
+        columnas_destino = ', '.join(qn(destino.get_field(campo).column) for campo in LoadData.columnas_registro())
+        llave = ', '.join(qn(destino.get_field(campo).column) for campo in LoadData.LLAVE_NATURAL)
+        llave_staging = ', '.join(qn(staging.get_field(campo).column) for campo in LoadData.LLAVE_NATURAL)
+        asignaciones = ', '.join(
+            f"{columna} = excluded.{columna}"
+            for columna in (qn(destino.get_field(campo).column) for campo in LoadData.CAMPOS_ACTUALIZABLES + ['row_hash'])
+        )
+        uniones = ' AND '.join(
+            f"r.{qn(destino.get_field(campo).column)} = {tabla_staging}.{qn(staging.get_field(campo).column)}"
+            for campo in LoadData.LLAVE_NATURAL
+        )
+        hash_col = qn(destino.get_field('row_hash').column)
+        hash_staging = qn(staging.get_field('row_hash').column)
+        
+        with connection.cursor() as cursor:
+            # Si una llave se preparó más de una vez, queda solo la última versión
+            cursor.execute(
+                f"DELETE FROM {tabla_staging} WHERE {carga_col} = %s AND {qn(staging.pk.column)} NOT IN ("
+                f"SELECT MAX({qn(staging.pk.column)}) FROM {tabla_staging} WHERE {carga_col} = %s GROUP BY {llave_staging})",
+                [carga, carga]
+            )
+            
+            # Staging tiene todas las llaves del archivo: se descartan las que ya están igual en la tabla
+            cursor.execute(
+                f"DELETE FROM {tabla_staging} WHERE {carga_col} = %s AND EXISTS ("
+                f"SELECT 1 FROM {qn(destino.db_table)} r WHERE {uniones} AND r.{hash_col} = {tabla_staging}.{hash_staging})",
+                [carga]
+            )
+            
+            fechas = list(
+                RegistroHorasStaging.objects.filter(carga=carga)
+                .values_list('date', flat=True).order_by().distinct()
+            )
+            nombres = list(
+                RegistroHorasStaging.objects.filter(carga=carga)
+                .values_list('employee__valor', flat=True).order_by().distinct()
+            )
+            
+            # El WHERE es obligatorio en SQLite para distinguir el ON CONFLICT del SELECT
+            with transaction.atomic():
+                cursor.execute(
+                    f"SELECT COUNT(*) - COUNT(r.{qn(destino.pk.column)}), COUNT(r.{qn(destino.pk.column)}) "
+                    f"FROM {tabla_staging} LEFT JOIN {qn(destino.db_table)} r ON {uniones} "
+                    f"WHERE {tabla_staging}.{carga_col} = %s",
+                    [carga]
+                )
+                creados, actualizados = cursor.fetchone()
+                cursor.execute(
+                    f"INSERT INTO {qn(destino.db_table)} ({columnas_destino}) "
+                    f"SELECT {columnas_staging} FROM {tabla_staging} WHERE {carga_col} = %s "
+                    f"ON CONFLICT ({llave}) DO UPDATE SET {asignaciones}",
+                    [carga]
                 )
+                if fechas:
+                    ResumenDiarioHoras.recalcular(fechas)
+        
+        LoadData.limpiar_staging(carga)
+        # El SQL directo no dispara post_save: avisar que RegistroHoras cambió
+        if fechas:
+            datos_modificados.send(sender=RegistroHoras)
+        LoadData.resolver_identidades(nombres)
+        return creados, actualizados
+
+    def resolver_identidades(nombres):
+        """
+        Relaciona con un Empleado los nombres nuevos de la carga. Un error aquí no invalida
+        la carga; los nombres se pueden resolver después desde la revisión de identidades.
+        """
+        try:
+            IdentidadEmpleado.resolver(nombres)
+        except DatabaseError as e:
+            print(f"Error al resolver identidades de empleados: {e}")
+
+    def limpiar_staging(carga):
+        """Elimina las filas de staging de una carga (aplicada o fallida)"""
+        RegistroHorasStaging.objects.filter(carga=carga).delete()
+
+    def proceso_vivo(host, pid):
+        """Indica si el proceso dueño de un bloqueo sigue en ejecución; de otro host no se puede saber"""
+        if not pid or host != socket.gethostname():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def liberar_bloqueo_abandonado():
+        """
+        Elimina el bloqueo si su latido tiene más de EXPIRACION_BLOQUEO segundos o si su
+        proceso ya terminó (p. ej. se reinició el servidor a mitad de una carga)
+        """
+        bloqueos = BloqueoCarga.objects.filter(nombre=LoadData.NOMBRE_BLOQUEO)
+        bloqueos.filter(latido__lt=timezone.now() - timedelta(seconds=LoadData.EXPIRACION_BLOQUEO)).delete()
+        for propietario, host, pid in bloqueos.values_list('propietario', 'host', 'pid'):
+            if not LoadData.proceso_vivo(host, pid):
+                print(f"Se libera el bloqueo de la carga {propietario}: el proceso {pid} en {host} ya no existe")
+                bloqueos.filter(propietario=propietario).delete()
+
+    def renovar_bloqueo(propietario):
+        """
+        Renueva el latido del bloqueo de la carga. Si otra carga lo tomó por considerarlo
+        abandonado, esta ya no puede seguir escribiendo.
+        """
+        renovados = BloqueoCarga.objects.filter(
+            nombre=LoadData.NOMBRE_BLOQUEO, propietario=propietario
+        ).update(latido=timezone.now())
+        if not renovados:
+            raise RuntimeError("La carga perdió el bloqueo de escritura: otra carga lo tomó por inactividad")
+
+    @contextmanager
+    def bloqueo_carga(propietario):
+        """
+        Bloqueo consultivo entre cargas, guardado como una fila de BloqueoCarga para que
+        funcione entre procesos. Espera hasta ESPERA_BLOQUEO segundos a que se libere y
+        toma los bloqueos abandonados (sin latido reciente o con el proceso dueño muerto).
+        """
+        limite = time.monotonic() + LoadData.ESPERA_BLOQUEO
+        while True:
+            LoadData.liberar_bloqueo_abandonado()
+            try:
+                with transaction.atomic():
+                    BloqueoCarga.objects.create(
+                        nombre=LoadData.NOMBRE_BLOQUEO, propietario=propietario,
+                        host=socket.gethostname(), pid=os.getpid()
+                    )
+                break
+            except IntegrityError:
+                if time.monotonic() > limite:
+                    raise TimeoutError("Otra carga de registro de horas sigue en proceso")
+                time.sleep(1)
+        
+        try:
+            yield
+        finally:
+            BloqueoCarga.objects.filter(nombre=LoadData.NOMBRE_BLOQUEO, propietario=propietario).delete()
+
+    def load_csv(file):
+        """
+        Carga un CSV (o XLSX) de registro de horas en RegistroHoras.
+        El archivo se guarda primero en disco y se procesa por bloques de TAMANO_BLOQUE
+        filas, liberando cada bloque antes de leer el siguiente, de modo que la memoria
+        usada no depende del tamaño del archivo.
+        """
+        ruta, _ = LoadData.guardar_en_disco(file)
+        try:
+            return LoadData.cargar_archivo(ruta)
+        finally:
+            os.remove(ruta)
+
+    def nuevo_resumen():
+        """Contadores de una carga (o de un archivo dentro de un ZIP)"""
+        return {
+            'filas': 0,
+            'creados': 0,
+            'actualizados': 0,
+            'sin_cambios': 0,
+            # Filas cuya llave natural ya apareció antes en la misma carga
+            'duplicados': 0,
+            'errores': 0,
+            'fecha_min': None,
+            'fecha_max': None,
+            'tiempos': {'lectura': 0.0, 'escritura': 0.0},
+        }
+
+    def preparar_archivo(ruta, encoding=None):
+        """
+        Lee y transforma el archivo por bloques sin tocar la base de datos.
+        Genera tuplas (registros, filas_leidas, errores) por bloque.
+        """
+        formato_fecha = None
+        for df in LoadData.leer_por_bloques(ruta, encoding):
+            filas = len(df)
+            registros, errores, formato_fecha = LoadData.preparar_bloque(df, formato_fecha)
+            del df
+            yield registros, filas, errores
+
+    def escribir_bloques(bloques, resumenes, carga, progreso=None):
+        """
+        Escribe en la staging de la carga los bloques preparados, uno a la vez, y acumula los
+        conteos en cada resumen de la lista resumenes (total de la carga y, en un ZIP,
+        el del archivo). progreso recibe el primero de ellos.
+        """
+        while True:
+            if progreso:
+                progreso('leyendo', resumenes[0])
+            
+            inicio = time.monotonic()
+            bloque = next(bloques, None)
+            if bloque is None:
+                break
+            registros, filas, errores_bloque = bloque
+            
+            # Rango de fechas del archivo, para identificar cargas que se traslapan
+            fecha_min = fecha_max = None
+            if not registros.empty:
+                fecha_min, fecha_max = registros['date'].min(), registros['date'].max()
+            lectura = time.monotonic() - inicio
+            
+            for resumen in resumenes:
+                resumen['filas'] += filas
+                resumen['errores'] += errores_bloque
+                resumen['tiempos']['lectura'] += lectura
+                if fecha_min:
+                    resumen['fecha_min'] = min(resumen['fecha_min'] or fecha_min, fecha_min)
+                    resumen['fecha_max'] = max(resumen['fecha_max'] or fecha_max, fecha_max)
+            
+            if progreso:
+                progreso('escribiendo', resumenes[0])
+            
+            inicio = time.monotonic()
+            LoadData.renovar_bloqueo(carga)
+            creados, actualizados, sin_cambios, duplicados, errores = LoadData.escribir_bloque(registros, carga)
+            escritura = time.monotonic() - inicio
+            del registros, bloque
+            
+            for resumen in resumenes:
+                resumen['tiempos']['escritura'] += escritura
+                resumen['creados'] += creados
+                resumen['actualizados'] += actualizados
+                resumen['sin_cambios'] += sin_cambios
+                resumen['duplicados'] += duplicados
+                resumen['errores'] += errores
+
+    def preparar_miembro_zip(ruta_zip, miembro, directorio):
+        """
+        Se ejecuta en un proceso del pool: extrae un archivo del ZIP, lo transforma
+        por bloques y guarda cada bloque preparado como pickle en directorio.
+        Retorna la lista de (ruta_bloque, filas_leidas, errores).
+        """
+        with zipfile.ZipFile(ruta_zip) as zip_file, zip_file.open(miembro) as origen:
+            with tempfile.NamedTemporaryFile(dir=directorio, suffix=LoadData.extension(miembro), delete=False) as destino:
+                shutil.copyfileobj(origen, destino, LoadData.TAMANO_BLOQUE_BYTES)
+        
+        bloques = []
+        try:
+            for numero, (registros, filas, errores) in enumerate(LoadData.preparar_archivo(destino.name)):
+                ruta_bloque = f"{destino.name}.{numero}.pkl"
+                registros.to_pickle(ruta_bloque)
+                bloques.append((ruta_bloque, filas, errores))
+        finally:
+            os.remove(destino.name)
+        
+        return bloques
+
+    def leer_bloques_preparados(bloques):
+        """Recupera, uno a la vez, los bloques guardados por preparar_miembro_zip y los elimina"""
+        for ruta_bloque, filas, errores in bloques:
+            registros = pd.read_pickle(ruta_bloque)
+            os.remove(ruta_bloque)
+            yield registros, filas, errores
+
+    def esperar_miembro(futuro, carga):
+        """Espera a que termine preparar_miembro_zip renovando el latido del bloqueo de la carga"""
+        while not wait([futuro], timeout=LoadData.LATIDO_BLOQUEO).done:
+            LoadData.renovar_bloqueo(carga)
+
+    def cargar_zip(ruta, resumen, carga, progreso=None):
+        """
+        Carga todos los CSV/XLSX de un ZIP. Cada archivo se lee y transforma en un
+        proceso distinto; la escritura la hace solo este hilo, para no competir por el
+        bloqueo de escritura de SQLite, archivo por archivo en el orden del ZIP: si una
+        llave natural aparece en varios archivos, siempre gana la del último.
+        Los conteos de cada archivo quedan en resumen['archivos']: clasifican sus filas al
+        leerlo, contra la BD y lo ya preparado por los archivos anteriores. No se concilian
+        con la fusión, así que si una llave cambia en un archivo y vuelve a su valor en otro,
+        la suma por archivo no coincide con los totales de la carga, que sí son lo escrito.
+        """
+        with zipfile.ZipFile(ruta) as zip_file:
+            miembros = [
+                info.filename for info in zip_file.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith('__MACOSX/')
+                and LoadData.extension(info.filename) in LoadData.EXTENSIONES_ZIP
+            ]
+        
+        if not miembros:
+            raise ValueError("El ZIP no contiene archivos CSV o XLSX")
+        
+        resumen['archivos'] = {}
+        procesos = min(len(miembros), getattr(settings, 'CARGA_HORAS_PROCESOS', None) or os.cpu_count() or 1)
+        directorio = tempfile.mkdtemp(prefix='registro_horas_zip_')
+        try:
+            # spawn: el proceso que encola puede tener hilos y conexiones abiertas
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futuros = [
+                    pool.submit(LoadData.preparar_miembro_zip, ruta, miembro, directorio)
+                    for miembro in miembros
+                ]
                 
-                if created:
-                    registros_creados += 1
-                else:
-                    registros_actualizados += 1
+                for miembro, futuro in zip(miembros, futuros):
+                    detalle = resumen['archivos'][miembro] = LoadData.nuevo_resumen()
+                    LoadData.esperar_miembro(futuro, carga)
+                    try:
+                        bloques = futuro.result()
+                    except Exception as e:
+                        detalle['error'] = str(e)
+                        continue
                     
-            except Exception as e:
-                print(f"Error al cargar la fila {row.to_dict()}: {e}")
-                errores += 1
-                continue
+                    LoadData.escribir_bloques(
+                        LoadData.leer_bloques_preparados(bloques),
+                        [resumen, detalle],
+                        carga,
+                        progreso
+                    )
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def cargar_archivo(ruta, progreso=None, encoding=None):
+        """
+        Procesa por bloques un CSV, CSV.GZ, XLSX o ZIP ya guardado en disco.
+        Si se indica, progreso(etapa, resumen) se llama al iniciar cada etapa y después de cada bloque.
+        encoding permite reutilizar la codificación ya detectada para este archivo.
+        """
+        resumen = LoadData.nuevo_resumen()
+        carga = uuid.uuid4().hex
         
-        print(f"Resumen: {registros_creados} creados, {registros_actualizados} actualizados, {errores} errores")
+        if progreso:
+            progreso('esperando', resumen)
+        
+        # El bloqueo cubre la clasificación y la fusión: así dos cargas simultáneas
+        # no comparan contra un RegistroHoras que la otra está por modificar
+        with LoadData.bloqueo_carga(carga):
+            # Solo escribe en staging quien tiene el bloqueo: lo que haya es de una carga interrumpida
+            RegistroHorasStaging.objects.exclude(carga=carga).delete()
+            try:
+                if LoadData.extension(ruta) == '.zip':
+                    LoadData.cargar_zip(ruta, resumen, carga, progreso)
+                else:
+                    LoadData.escribir_bloques(LoadData.preparar_archivo(ruta, encoding), [resumen], carga, progreso)
+                
+                if progreso:
+                    progreso('fusionando', resumen)
+                inicio = time.monotonic()
+                LoadData.renovar_bloqueo(carga)
+                creados, actualizados = LoadData.fusionar_staging(carga)
+                # Al leer, una llave repetida en bloques distintos se clasificó contra la BD
+                # previa; el total de llaves únicas no cambia, pero el reparto final sale de la fusión.
+                # Los conteos por archivo de un ZIP se quedan como se clasificaron al leer
+                unicas = resumen['creados'] + resumen['actualizados'] + resumen['sin_cambios']
+                resumen['creados'], resumen['actualizados'] = creados, actualizados
+                resumen['sin_cambios'] = unicas - creados - actualizados
+                resumen['tiempos']['fusion'] = time.monotonic() - inicio
+            finally:
+                LoadData.limpiar_staging(carga)
+        
+        print(f"Total de filas en el archivo: {resumen['filas']}")
+        print(
+            f"Resumen: {resumen['creados']} creados, {resumen['actualizados']} actualizados, "
+            f"{resumen['sin_cambios']} sin cambios, {resumen['duplicados']} duplicados, {resumen['errores']} errores"
+        )
         
         # Verificar que se guardaron en la BD
-        total_registros = RegistroHoras.objects.count()
-        print(f"Total de registros en BD después de la carga: {total_registros}")
+        resumen['total_bd'] = RegistroHoras.objects.count()
+        print(f"Total de registros en BD después de la carga: {resumen['total_bd']}")
         
+        return resumen
+
+
+class MantenimientoBD():
+    """
+    Mantenimiento de la base SQLite tras cargas grandes: estadísticas del planificador,
+    devolución de páginas libres (vacuum incremental) y checkpoint del WAL
+    """
+
+    # Filas por índice que muestrea ANALYZE (0 = análisis completo)
+    LIMITE_ANALISIS = 1000
+
+    def consultar(sql):
+        """Ejecuta un PRAGMA o sentencia y regresa todas sus filas"""
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def valor(pragma):
+        """Valor actual de un PRAGMA"""
+        return MantenimientoBD.consultar(f"PRAGMA {pragma}")[0][0]
+
+    def pragmas():
+        """Valor actual de cada PRAGMA configurado en SQLITE_PRAGMAS y de auto_vacuum"""
+        nombres = [*getattr(settings, 'SQLITE_PRAGMAS', {}), 'auto_vacuum']
+        return {nombre: MantenimientoBD.valor(nombre) for nombre in nombres}
+
+    def tamano():
+        """Páginas en uso y libres del archivo de la base de datos, en bytes"""
+        tamano_pagina = MantenimientoBD.valor('page_size')
         return {
-            'creados': registros_creados,
-            'actualizados': registros_actualizados,
-            'errores': errores,
-            'total_bd': total_registros
+            'bytes': MantenimientoBD.valor('page_count') * tamano_pagina,
+            'libres': MantenimientoBD.valor('freelist_count') * tamano_pagina,
         }
 
-        
+    def ejecutar(analisis_completo=False, vacuum_completo=False, paginas=None):
+        """
+        Actualiza las estadísticas del planificador (ANALYZE y PRAGMA optimize), devuelve al
+        sistema las páginas libres si la base usa auto_vacuum incremental y trunca el WAL.
+        vacuum_completo cambia una base existente a auto_vacuum incremental con un VACUUM,
+        que reescribe el archivo y bloquea la base mientras dura. Retorna un resumen.
+        """
+        if connection.vendor != 'sqlite':
+            raise ValueError("El mantenimiento solo aplica a SQLite")
+        if paginas is None:
+            paginas = getattr(settings, 'SQLITE_VACUUM_PAGINAS', 0)
+
+        antes = MantenimientoBD.tamano()
+        tiempos = {}
 
-            #Añadir columna de facturable o no facturable 
\ No newline at end of file
+        if vacuum_completo:
+            inicio = time.monotonic()
+            MantenimientoBD.consultar("PRAGMA auto_vacuum = INCREMENTAL")
+            MantenimientoBD.consultar("VACUUM")
+            tiempos['vacuum'] = time.monotonic() - inicio
+
+        inicio = time.monotonic()
+        MantenimientoBD.consultar(f"PRAGMA analysis_limit = {0 if analisis_completo else MantenimientoBD.LIMITE_ANALISIS}")
+        MantenimientoBD.consultar("ANALYZE")
+        MantenimientoBD.consultar("PRAGMA optimize")
+        tiempos['analisis'] = time.monotonic() - inicio
+
+        # 2 = INCREMENTAL; con otro modo las páginas libres solo se recuperan con un VACUUM completo
+        incremental = MantenimientoBD.valor('auto_vacuum') == 2
+        if incremental:
+            inicio = time.monotonic()
+            # El módulo sqlite3 de Python avanza una sola vez una sentencia sin filas (libera una
+            # página); executescript la ejecuta completa
+            connection.ensure_connection()
+            connection.connection.executescript(
+                f"PRAGMA incremental_vacuum({paginas})" if paginas else "PRAGMA incremental_vacuum"
+            )
+            tiempos['vacuum_incremental'] = time.monotonic() - inicio
+
+        if MantenimientoBD.valor('journal_mode') == 'wal':
+            inicio = time.monotonic()
+            MantenimientoBD.consultar("PRAGMA wal_checkpoint(TRUNCATE)")
+            tiempos['checkpoint'] = time.monotonic() - inicio
+
+        return {
+            'antes': antes,
+            'despues': MantenimientoBD.tamano(),
+            'vacuum_incremental': incremental,
+            'tiempos': tiempos,
+        }
@@ -3,13 +3,16 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from apps.custom_auth.models import Empleado
 from apps.dashboard.models import KpiInputData
-from .models import Proyecto, AsignacionProyecto
-from .serializers import ProyectoSerializer, AsignacionProyectoSerializer
+from .models import Proyecto, AsignacionProyecto, TrabajoCarga, ArchivoCarga, IdentidadEmpleado, ValorDimension
+from .serializers import ProyectoSerializer, AsignacionProyectoSerializer, TrabajoCargaSerializer, ArchivoCargaSerializer, IdentidadEmpleadoSerializer
 from apps.dashboard.serializers import KpiInputDataSerializer
 from rest_framework.decorators import api_view, parser_classes
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from .jobs import encolar_carga, recuperar_trabajos_abandonados
 from .utils import LoadData
 
 def has_proyectos_permission(user):
@@ -168,16 +171,156 @@ def upload_manual_log(request):
 @parser_classes([MultiPartParser])
 @permission_classes([IsAuthenticated])
 def upload_csv(request):
+    """
+    Recibe un archivo de registro de horas y lo encola. Un archivo con el mismo contenido que
+    uno ya cargado no se vuelve a procesar, salvo con forzar=true (p. ej. tras depurar sus datos).
+    """
     file = request.FILES.get('file')
+    forzar = str(request.data.get('forzar', '')).lower() in ('1', 'true', 'si', 'sí')
 
     if not file:
         return Response({"error": "No se envió ningún archivo"}, status=status.HTTP_400_BAD_REQUEST)
 
-    if not file.name.endswith('.csv'):
-        return Response({"error": "El archivo debe ser un CSV"}, status=status.HTTP_400_BAD_REQUEST)
+    if LoadData.extension(file.name) not in LoadData.EXTENSIONES:
+        return Response({"error": "El archivo debe ser un CSV, CSV.GZ, XLSX o un ZIP con archivos CSV/XLSX"}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        LoadData.load_csv(file)
-        return Response({"message": "Archivo procesado correctamente"}, status=status.HTTP_200_OK)
+        trabajo, duplicado = encolar_carga(file, request.user, forzar=forzar)
+        if duplicado:
+            return Response(
+                {
+                    "message": "Este archivo ya fue cargado anteriormente",
+                    "trabajo_id": trabajo.id,
+                    "duplicado": True,
+                    "resultado": TrabajoCargaSerializer(trabajo).data
+                },
+                status=status.HTTP_200_OK
+            )
+        return Response(
+            {"message": "Archivo recibido, se procesará en segundo plano", "trabajo_id": trabajo.id},
+            status=status.HTTP_202_ACCEPTED
+        )
     except Exception as e:
-        return Response({"error": f"Ocurrió un error al procesar el archivo: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": f"Ocurrió un error al procesar el archivo: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estado_carga(request, trabajo_id):
+    """
+    Consulta el progreso de una carga de registro de horas. Si el proceso que la
+    ejecutaba terminó sin completarla, queda marcada como error.
+    """
+    try:
+        recuperar_trabajos_abandonados(TrabajoCarga.objects.filter(id=trabajo_id))
+        trabajo = TrabajoCarga.objects.get(id=trabajo_id)
+        serializer = TrabajoCargaSerializer(trabajo)
+        return Response(serializer.data)
+    except TrabajoCarga.DoesNotExist:
+        return Response(
+            {"error": "Carga no encontrada"}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def view_archivos_carga(request):
+    """
+    Lista paginada (parámetro page) de los archivos de registro de horas cargados con su
+    rango de fechas y los archivos con los que se traslapan.
+    """
+    paginador = PageNumberPagination()
+    archivos = paginador.paginate_queryset(ArchivoCarga.objects.all(), request)
+    serializer = ArchivoCargaSerializer(
+        archivos, many=True, context={'solapados': ArchivoCarga.solapados_por_archivo(archivos)}
+    )
+    return paginador.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def view_identidades_empleado(request):
+    """
+    Revisión de la relación entre los nombres del registro de horas y los empleados.
+    Parámetros de query opcionales:
+    - metodo: exacto, similitud, manual, sin_resolver o todos (por defecto: sin_resolver)
+    Los nombres sin resolver incluyen hasta 3 empleados sugeridos.
+    """
+    metodo = request.GET.get('metodo', 'sin_resolver')
+    identidades = IdentidadEmpleado.objects.select_related('empleado')
+    if metodo != 'todos':
+        if metodo not in dict(IdentidadEmpleado.METODO_CHOICES):
+            return Response(
+                {"error": f"Método '{metodo}' no válido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        identidades = identidades.filter(metodo=metodo)
+
+    datos = IdentidadEmpleadoSerializer(identidades, many=True).data
+    pendientes = [identidad for identidad in datos if identidad['metodo'] == 'sin_resolver']
+    if pendientes:
+        empleados, indice = IdentidadEmpleado.indice_empleados()
+        nombres = dict(Empleado.objects.values_list('id', 'nombre_completo'))
+        for identidad in pendientes:
+            identidad['sugerencias'] = [
+                {'empleado': empleado_id, 'nombre': nombres[empleado_id], 'similitud': round(similitud, 3)}
+                for empleado_id, similitud, _ in IdentidadEmpleado.similitudes(
+                    identidad['nombre_normalizado'], empleados, indice
+                )[:3]
+            ]
+
+    return Response(datos)
+
+
+@api_view(['POST', 'PUT', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def asignar_identidad_empleado(request, identidad_id):
+    """
+    Asigna a mano el empleado de un nombre del registro de horas (empleado: null lo deja sin resolver).
+    Solo disponible para superusuarios.
+    """
+    if not request.user.is_superuser:
+        return Response(
+            {"error": "No tienes permiso para asignar empleados"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        identidad = IdentidadEmpleado.objects.get(id=identidad_id)
+    except IdentidadEmpleado.DoesNotExist:
+        return Response(
+            {"error": "Identidad no encontrada"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    serializer = IdentidadEmpleadoSerializer(identidad, data=request.data, partial=True)
+    if serializer.is_valid():
+        empleado = serializer.validated_data.get('empleado', identidad.empleado)
+        serializer.save(
+            metodo='manual' if empleado else 'sin_resolver',
+            similitud=None
+        )
+        return Response(serializer.data)
+
+    return Response(
+        {"error": serializer.errors},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def resolver_identidades_empleado(request):
+    """
+    Registra los nombres del registro de horas que aún no tienen identidad y vuelve a buscar
+    empleado para los que quedaron sin resolver. Solo disponible para superusuarios.
+    """
+    if not request.user.is_superuser:
+        return Response(
+            {"error": "No tienes permiso para resolver identidades"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    nombres = ValorDimension.objects.filter(dimension='employee').values_list('valor', flat=True)
+    return Response(IdentidadEmpleado.resolver(nombres, reintentar=True))